@@ -0,0 +1,150 @@
+"""Numeric backends that decide how coordinates are stored.
+
+Decimal (the default) keeps 30 significant digits, float runs on
+hardware doubles and fraction keeps every coordinate as an exact
+rational, so zero tests need no tolerance."""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal, getcontext
+from fractions import Fraction
+from math import isqrt, sqrt
+
+getcontext().prec = 30
+
+
+class Backend(object):
+    """Base class of the numeric backends"""
+    UNKNOWN_BACKEND_MSG = 'Unknown numeric backend: {}'
+
+    name = None
+    zero = None
+    one = None
+    # Relative tolerance expressed in the backend's numbers
+    eps = None
+
+    def convert(self, value):
+        """Converts a number or numeric string to this backend"""
+        raise NotImplementedError
+
+    def sqrt(self, value):
+        """Returns the square root of a non-negative value"""
+        raise NotImplementedError
+
+    def is_near_zero(self, value, eps=1e-10):
+        """Checks if the value is zero up to eps"""
+        return abs(value) < eps
+
+    def __repr__(self):
+        return 'Backend: {}'.format(self.name)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (get_backend, (self.name,))
+
+
+class DecimalBackend(Backend):
+    """Coordinates are Decimals with the module precision"""
+    name = 'decimal'
+    zero = Decimal('0')
+    one = Decimal('1.0')
+    eps = Decimal('1e-10')
+
+    def convert(self, value):
+        return Decimal(value)
+
+    def sqrt(self, value):
+        return value**Decimal('0.5')
+
+
+class FloatBackend(Backend):
+    """Coordinates are hardware float64 numbers"""
+    name = 'float'
+    zero = 0.0
+    one = 1.0
+    eps = 1e-10
+
+    def convert(self, value):
+        return float(value)
+
+    def sqrt(self, value):
+        return sqrt(value)
+
+
+class FractionBackend(Backend):
+    """Coordinates are exact rationals and zero tests are exact"""
+    name = 'fraction'
+    zero = Fraction(0)
+    one = Fraction(1)
+    eps = Fraction(0)
+
+    def convert(self, value):
+        return Fraction(value)
+
+    def sqrt(self, value):
+        """Exact for squares of rationals, rounded through float
+        otherwise"""
+        numerator = isqrt(value.numerator)
+        denominator = isqrt(value.denominator)
+        if (numerator * numerator == value.numerator and
+                denominator * denominator == value.denominator):
+            return Fraction(numerator, denominator)
+        return Fraction(sqrt(value))
+
+    def is_near_zero(self, value, eps=1e-10):
+        return value == 0
+
+
+DECIMAL = DecimalBackend()
+FLOAT = FloatBackend()
+FRACTION = FractionBackend()
+
+BACKENDS = {backend.name: backend for backend in (DECIMAL, FLOAT, FRACTION)}
+
+_state = threading.local()
+
+
+def get_backend(backend=None):
+    """Resolves a backend instance or name; None gives the default"""
+    if backend is None:
+        return get_default_backend()
+    if isinstance(backend, Backend):
+        return backend
+    try:
+        return BACKENDS[backend]
+    except KeyError:
+        raise ValueError(Backend.UNKNOWN_BACKEND_MSG.format(backend))
+
+
+def get_default_backend():
+    """Returns the backend used when none is given (per thread)"""
+    return getattr(_state, 'backend', DECIMAL)
+
+
+def set_default_backend(backend):
+    """Sets the backend used when none is given (per thread)"""
+    _state.backend = get_backend(backend)
+
+
+@contextmanager
+def local_backend(backend):
+    """Temporarily changes the default backend, in the spirit of
+    decimal.localcontext"""
+    previous = get_default_backend()
+    set_default_backend(backend)
+    try:
+        yield get_default_backend()
+    finally:
+        set_default_backend(previous)
+
+
+def is_near_zero(value, eps=1e-10):
+    """Checks if the value is zero up to eps; Fractions are exact so
+    they are compared to zero directly"""
+    if isinstance(value, Fraction):
+        return value == 0
+    return abs(value) < eps
@@ -0,0 +1,118 @@
+"""Solving many small independent linear systems in one call"""
+from decimal import getcontext
+
+from backend import get_backend, is_near_zero
+from linsys import LinearSystem
+from matrix import AugmentedMatrix
+
+getcontext().prec = 30
+
+
+class BatchSolution(object):
+    """Per-system results of solve_batch, in input order.
+
+    statuses[i] is UNIQUE_SOLUTION_MSG, LinearSystem.INF_SOLUTIONS_MSG
+    or LinearSystem.NO_SOLUTIONS_MSG; basepoints[i] is a list of n
+    coordinates (None without solutions) and direction_vectors[i] a
+    list of coordinate lists, empty for unique solutions"""
+    UNIQUE_SOLUTION_MSG = 'Unique solution'
+    SHAPE_MISMATCH_MSG = ('All systems must have the same number of '
+                          'equations and variables')
+
+    def __init__(self, statuses, basepoints, direction_vectors):
+        self.statuses = statuses
+        self.basepoints = basepoints
+        self.direction_vectors = direction_vectors
+
+    def __len__(self):
+        return len(self.statuses)
+
+    def __getitem__(self, i):
+        return (self.statuses[i], self.basepoints[i],
+                self.direction_vectors[i])
+
+
+def solve_batch(coefficients, constant_terms, backend='float'):
+    """Solves B systems given as stacked coefficients (B x m x n) and
+    constant terms (B x m), without building Vector, Plane or
+    LinearSystem objects. Square 2x2 and 3x3 systems with a non-zero
+    determinant use Cramer's rule; the others are eliminated on an
+    AugmentedMatrix with partial pivoting. Returns a BatchSolution."""
+    backend = get_backend(backend)
+    if len(coefficients) != len(constant_terms):
+        raise Exception(BatchSolution.SHAPE_MISMATCH_MSG)
+    if not coefficients:
+        return BatchSolution([], [], [])
+    num_equations = len(coefficients[0])
+    num_variables = len(coefficients[0][0])
+
+    convert = backend.convert
+    kernel = _CLOSED_FORM_KERNELS.get((num_equations, num_variables))
+    statuses, basepoints, direction_vectors = [], [], []
+    for a, k in zip(coefficients, constant_terms):
+        if len(a) != num_equations or len(k) != num_equations:
+            raise Exception(BatchSolution.SHAPE_MISMATCH_MSG)
+        rows = []
+        for row, constant in zip(a, k):
+            if len(row) != num_variables:
+                raise Exception(BatchSolution.SHAPE_MISMATCH_MSG)
+            rows.append([convert(x) for x in row] + [convert(constant)])
+
+        basepoint = kernel(rows) if kernel else None
+        if basepoint is not None:
+            statuses.append(BatchSolution.UNIQUE_SOLUTION_MSG)
+            basepoints.append(basepoint)
+            direction_vectors.append([])
+            continue
+
+        status, basepoint, directions = _solve_by_elimination(
+            rows, num_variables, backend)
+        statuses.append(status)
+        basepoints.append(basepoint)
+        direction_vectors.append(directions)
+
+    return BatchSolution(statuses, basepoints, direction_vectors)
+
+
+def _solve_by_elimination(rows, num_variables, backend):
+    rref = AugmentedMatrix(rows, num_variables, backend).compute_rref(
+        AugmentedMatrix.PARTIAL_PIVOTING)
+    if rref.has_contradictory_equation():
+        return LinearSystem.NO_SOLUTIONS_MSG, None, []
+    directions = rref.extract_direction_vectors_for_parametrization()
+    basepoint = rref.extract_basepoint_for_parametrization()
+    if directions:
+        return LinearSystem.INF_SOLUTIONS_MSG, basepoint, directions
+    return BatchSolution.UNIQUE_SOLUTION_MSG, basepoint, directions
+
+
+def _cramer_2x2(rows):
+    """Returns the unique solution, or None if the determinant is
+    (near) zero"""
+    (a, b, k1), (c, d, k2) = rows
+    det = a * d - b * c
+    if is_near_zero(det):
+        return None
+    return [(k1 * d - b * k2) / det, (a * k2 - c * k1) / det]
+
+
+def _cramer_3x3(rows):
+    """Returns the unique solution, or None if the determinant is
+    (near) zero"""
+    (a, b, c, k1), (d, e, f, k2), (g, h, i, k3) = rows
+    cofactor_a = e * i - f * h
+    cofactor_b = f * g - d * i
+    cofactor_c = d * h - e * g
+    det = a * cofactor_a + b * cofactor_b + c * cofactor_c
+    if is_near_zero(det):
+        return None
+    x = (k1 * cofactor_a + b * (f * k3 - k2 * i) +
+         c * (k2 * h - e * k3)) / det
+    y = (a * (k2 * i - f * k3) + k1 * cofactor_b +
+         c * (d * k3 - k2 * g)) / det
+    z = (a * (e * k3 - k2 * h) + b * (k2 * g - d * k3) +
+         k1 * cofactor_c) / det
+    return [x, y, z]
+
+
+_CLOSED_FORM_KERNELS = {(2, 2): _cramer_2x2, (3, 3): _cramer_3x3}
@@ -0,0 +1,374 @@
+"""Benchmarks for the linear algebra classes.
+
+Run ``python benchmark.py`` to report the memory used per object by
+Vector, Line, Plane and Hyperplane, then the time and peak memory of
+the timed scenarios: Vector operations, parallelism and equality
+checks, 2D line intersections, and rref/solve on dense, sparse,
+singular and inconsistent systems, for every backend.
+
+``--json results.json`` saves the results; ``--baseline results.json``
+compares a run against saved results. The exit status is 1 when an
+object grows past its entry in MEMORY_TARGETS or a scenario is slower
+or uses more memory than its baseline by more than --tolerance, so
+regressions are caught."""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from vector import Vector
+from line import Line
+from plane import Plane
+from hyperplane import Hyperplane
+from backend import get_backend
+from vector_array import VectorArray
+from line_array import LineArray
+from matrix import AugmentedMatrix
+from linsys import LinearSystem
+from sparse import SparseLinearSystem
+from iterative import bicgstab, gmres
+
+# Bytes per object. Vector counts its three Decimal coordinates, the
+# other classes count everything but their (shared) normal vector.
+MEMORY_TARGETS = {
+    'Vector': 500,
+    'Line': 200,
+    'Plane': 200,
+    'Hyperplane': 200,
+}
+
+BACKENDS = ('decimal', 'float', 'fraction')
+# Objects per geometry scenario and unknowns per system scenario
+DEFAULT_OPERATIONS = 1000
+DEFAULT_SIZES = (10, 30)
+DEFAULT_TOLERANCE = 0.25
+
+
+def bytes_per_object(factory, count):
+    """Returns the average traced memory kept alive by factory(i)"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [factory(i) for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del objects
+    return float(after - before) / count
+
+
+def memory_scenarios(count):
+    """Returns the object factories measured by the memory benchmark"""
+    vectors_2d = [Vector([i, i + 1]) for i in range(count)]
+    vectors_3d = [Vector([i, i + 1, i + 2]) for i in range(count)]
+    return {
+        'Vector': lambda i: Vector([i, i + 1, i + 2]),
+        'Line': lambda i: Line(vectors_2d[i], i),
+        'Plane': lambda i: Plane(vectors_3d[i], i),
+        'Hyperplane': lambda i: Hyperplane(normal_vector=vectors_3d[i],
+                                           constant_term=i),
+    }
+
+
+def run_memory_benchmark(count=10000):
+    """Measures every memory scenario against its target"""
+    results = {}
+    for name, factory in sorted(memory_scenarios(count).items()):
+        results[name] = {
+            'bytes_per_object': bytes_per_object(factory, count),
+            'target': MEMORY_TARGETS[name],
+        }
+    return results
+
+
+def _random_numbers(rnd, count):
+    """Returns numbers with 3 decimals, as strings so that every backend
+    converts them exactly"""
+    return ['%.3f' % rnd.uniform(-10, 10) for _ in range(count)]
+
+
+def geometry_scenarios(count, backend, rnd):
+    """Returns {name: function} for the Vector, Line and Plane
+    scenarios, each function running its operation on count objects"""
+    def vectors(dimension):
+        return [Vector(_random_numbers(rnd, dimension), backend)
+                for _ in range(count)]
+
+    first, second = vectors(3), vectors(3)
+    # Half of the pairs are parallel
+    parallel = [v if i % 2 else v.times_scalar(backend.convert('-2.5'))
+                for i, v in enumerate(second)]
+    constants = _random_numbers(rnd, count)
+    planes = [Plane(v, k) for v, k in zip(first, constants)]
+    other_planes = [Plane(v.times_scalar(backend.convert('2')),
+                          backend.convert(k) * 2) if i % 2 else Plane(w, k)
+                    for i, (v, w, k) in enumerate(zip(first, parallel,
+                                                      constants))]
+    lines = [Line(v, k) for v, k in zip(vectors(2), constants)]
+    other_lines = [Line(v, k) for v, k in zip(vectors(2), constants)]
+    pairs = list(zip(first, second))
+
+    scenarios = {
+        'vector.plus': lambda: [v.plus(w) for v, w in pairs],
+        'vector.dot': lambda: [v.dot(w) for v, w in pairs],
+        # New vectors each run, since magnitude() and normalized() are
+        # cached
+        'vector.magnitude': lambda: [Vector(v.coordinates, backend)
+                                     .magnitude() for v in first],
+        'vector.normalized': lambda: [Vector(v.coordinates, backend)
+                                      .normalized() for v in first],
+        'vector.angle_with': lambda: [v.angle_with(w) for v, w in pairs],
+        'vector.cross': lambda: [v.cross(w) for v, w in pairs],
+        'vector.is_parallel_to': lambda: [
+            v.is_parallel_to(w) for v, w in zip(first, parallel)],
+        'vector.is_orthogonal_to': lambda: [
+            v.is_orthogonal_to(w) for v, w in pairs],
+        'plane.eq': lambda: [p == q for p, q in zip(planes, other_planes)],
+        'plane.is_parallel_to': lambda: [
+            p.is_parallel_to(q) for p, q in zip(planes, other_planes)],
+        'line.intersection_with': lambda: [
+            p.intersection_with(q) for p, q in zip(lines, other_lines)],
+    }
+    if backend.name == 'float':
+        array_first = VectorArray.from_vectors(first)
+        array_second = VectorArray.from_vectors(second)
+        scenarios['vector_array.angle_with'] = (
+            lambda: array_first.angle_with(array_second))
+        # All pairs of about sqrt(2 count) lines, i.e. about count pairs
+        line_array = LineArray.from_lines(lines[:int((2 * count) ** 0.5) + 1])
+        scenarios['line_array.intersections'] = line_array.intersections
+    return scenarios
+
+
+def _system_rows(rnd, size, rank, nonzeros_per_row=None, consistent=True):
+    """Returns the float rows of size equations in size unknowns whose
+    coefficients have the given rank"""
+    def coefficients():
+        if nonzeros_per_row is None:
+            return [rnd.uniform(-10, 10) for _ in range(size)]
+        row = [0.0] * size
+        for var in rnd.sample(range(size), min(nonzeros_per_row, size)):
+            row[var] = rnd.uniform(-10, 10)
+        return row
+
+    basis = [coefficients() for _ in range(rank)]
+    solution = [rnd.uniform(-10, 10) for _ in range(size)]
+    rows = []
+    for i in range(size):
+        if i < rank:
+            row = basis[i]
+        else:
+            weights = [rnd.uniform(-1, 1) for _ in range(rank)]
+            row = [sum(w * b[var] for w, b in zip(weights, basis))
+                   for var in range(size)]
+        constant = sum(a * x for a, x in zip(row, solution))
+        if not consistent and i >= rank:
+            constant += 1
+        rows.append(row + [constant])
+    return rows
+
+
+def system_scenarios(size, backend, rnd):
+    """Returns {name: function} for rref and solve on size x size
+    systems"""
+    systems = {
+        'dense': _system_rows(rnd, size, size),
+        'sparse': _system_rows(rnd, size, size, nonzeros_per_row=3),
+        'singular': _system_rows(rnd, size, max(1, size - 2)),
+        'inconsistent': _system_rows(rnd, size, max(1, size - 2),
+                                     consistent=False),
+    }
+    scenarios = {}
+    for kind, float_rows in systems.items():
+        rows = [[backend.convert('%.6f' % x) for x in row]
+                for row in float_rows]
+        system = LinearSystem.from_matrix(
+            AugmentedMatrix(rows, size, backend))
+        scenarios['system.{}.rref'.format(kind)] = (
+            lambda system=system: system.compute_rref())
+        scenarios['system.{}.solve'.format(kind)] = (
+            lambda system=system: system.compute_solution())
+        scenarios['system.{}.solve_partial'.format(kind)] = (
+            lambda system=system: system.compute_solution('partial'))
+
+    exact_system = LinearSystem.from_matrix(AugmentedMatrix(
+        [[backend.convert('%.6f' % x) for x in row]
+         for row in systems['dense']], size, backend)).exact()
+    scenarios['system.dense.solve_exact'] = exact_system.compute_solution
+
+    # Float rows, to compare with system.dense.rref on the float backend
+    blocked_system = LinearSystem.from_matrix(AugmentedMatrix(
+        systems['dense'], size, 'float')).blocked()
+    scenarios['system.dense.rref_blocked'] = blocked_system.compute_rref
+
+    sparse_rows = systems['sparse']
+    sparse_system = SparseLinearSystem(
+        [{var: '%.6f' % x for var, x in enumerate(row[:-1]) if x}
+         for row in sparse_rows],
+        ['%.6f' % row[-1] for row in sparse_rows], size, backend)
+    scenarios['sparse_system.solve'] = sparse_system.compute_solution
+
+    # Iterative solvers on the sparse rows made diagonally dominant
+    dominant_rows = [{var: x for var, x in enumerate(row[:-1]) if x}
+                     for row in sparse_rows]
+    for i, row in enumerate(dominant_rows):
+        row[i] = sum(abs(x) for x in row.values()) + 1.0
+    dominant_system = SparseLinearSystem(
+        dominant_rows, [row[-1] for row in sparse_rows], size, backend)
+    scenarios['sparse_system.gmres_ilu'] = (
+        lambda: gmres(dominant_system, preconditioner='ilu'))
+    scenarios['sparse_system.bicgstab_ilu'] = (
+        lambda: bicgstab(dominant_system, preconditioner='ilu'))
+    return scenarios
+
+
+def time_function(function, repeat):
+    """Returns the best wall time of repeat calls"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def peak_memory(function):
+    """Returns the peak traced memory, in bytes, during one call"""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_time_benchmark(operations=DEFAULT_OPERATIONS, sizes=DEFAULT_SIZES,
+                       backends=BACKENDS, repeat=3, seed=0, select=None):
+    """Runs the timed scenarios and returns one result per scenario,
+    backend and size. select keeps the scenarios whose name contains
+    one of the given strings."""
+    def selected(name):
+        return not select or any(s in name for s in select)
+
+    results = []
+
+    def measure(scenarios, backend, size):
+        for name, function in sorted(scenarios.items()):
+            if not selected(name):
+                continue
+            results.append({
+                'scenario': name,
+                'backend': backend.name,
+                'size': size,
+                'seconds': time_function(function, repeat),
+                'peak_bytes': peak_memory(function),
+            })
+
+    for backend_name in backends:
+        backend = get_backend(backend_name)
+        # Every scenario gets the same inputs whatever ran before it
+        measure(geometry_scenarios(operations, backend, random.Random(seed)),
+                backend, operations)
+        for size in sizes:
+            measure(system_scenarios(size, backend, random.Random(seed)),
+                    backend, size)
+    return results
+
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Returns a message for every result that is slower, or uses more
+    memory, than its baseline result by more than tolerance (0.25 for
+    25%)"""
+    def key(result):
+        return result['scenario'], result['backend'], result['size']
+
+    baseline_results = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline_results.get(key(result))
+        if base is None:
+            continue
+        for measure in ('seconds', 'peak_bytes'):
+            if result[measure] > base[measure] * (1 + tolerance):
+                regressions.append('{} ({}, size {}): {} {:.6g} > {:.6g}'
+                                   .format(result['scenario'],
+                                           result['backend'],
+                                           result['size'], measure,
+                                           result[measure], base[measure]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=10000,
+                        help='objects created per memory scenario')
+    parser.add_argument('--operations', type=int,
+                        default=DEFAULT_OPERATIONS,
+                        help='objects per geometry scenario')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated numbers of unknowns of the '
+                             'system scenarios')
+    parser.add_argument('--backends', default=','.join(BACKENDS),
+                        help='comma separated backends to compare')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per scenario, the best one is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--select', default='',
+                        help='comma separated parts of scenario names to '
+                             'run, all by default')
+    parser.add_argument('--suite', choices=('all', 'memory', 'time'),
+                        default='all')
+    parser.add_argument('--json', help='file the results are written to')
+    parser.add_argument('--baseline',
+                        help='results file of a previous run to compare to')
+    parser.add_argument('--tolerance', type=float,
+                        default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown or memory growth over the '
+                             'baseline, 0.25 for 25%%')
+    args = parser.parse_args(argv)
+
+    failed = False
+    report = {'python': platform.python_version(), 'memory': {},
+              'timings': []}
+    if args.suite in ('all', 'memory'):
+        report['memory'] = run_memory_benchmark(args.count)
+        for name, result in sorted(report['memory'].items()):
+            over = result['bytes_per_object'] > result['target']
+            failed = failed or over
+            print('{:<12} {:>8.1f} bytes per object (target {}){}'.format(
+                name, result['bytes_per_object'], result['target'],
+                '  OVER TARGET' if over else ''))
+
+    if args.suite in ('all', 'time'):
+        report['timings'] = run_time_benchmark(
+            args.operations, [int(size) for size in args.sizes.split(',')],
+            args.backends.split(','), args.repeat, args.seed,
+            [name for name in args.select.split(',') if name])
+        for result in report['timings']:
+            print('{:<34} {:<9} {:>5} {:>12.6f} s {:>12} bytes'.format(
+                result['scenario'], result['backend'], result['size'],
+                result['seconds'], result['peak_bytes']))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_results(report['timings'],
+                                      baseline.get('timings', []),
+                                      args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,19 @@
-from decimal import Decimal, getcontext
+from decimal import getcontext
 from vector import Vector
+from backend import is_near_zero
 
 getcontext().prec = 30
 
 
 class Hyperplane(object):
+    """The equation n . x = k in any dimension. Line and Plane are
+    subclasses that only change the default dimension, so systems of
+    any dimension share this implementation"""
+
+    __slots__ = ('dimension', 'normal_vector', 'constant_term', '_basepoint')
 
     NO_NONZERO_ELTS_FOUND_MSG = 'No nonzero elements found'
+    DIMENSION_MISMATCH_MSG = 'Hyperplanes must live in the same dimension'
     EITHER_DIM_OR_NORMAL_VEC_MUST_BE_PROVIDED_MSG = (
         'Either the dimension of the hyperplane or the normal vector '
         'must be provided')
@@ -24,33 +31,70 @@ class Hyperplane(object):
 
         self.normal_vector = normal_vector
 
+        backend = normal_vector.backend
         if not constant_term:
-            constant_term = Decimal('0')
-        self.constant_term = Decimal(constant_term)
+            constant_term = backend.zero
+        self.constant_term = backend.convert(constant_term)
+
+    @property
+    def basepoint(self):
+        """The basepoint is computed on first access"""
+        try:
+            return self._basepoint
+        except AttributeError:
+            self.set_basepoint()
+            return self._basepoint
 
-        self.set_basepoint()
+    @basepoint.setter
+    def basepoint(self, basepoint):
+        self._basepoint = basepoint
+
+    def with_equation(self, normal_vector, constant_term):
+        """Returns a hyperplane of the same class with another equation"""
+        return type(self)(normal_vector=normal_vector,
+                          constant_term=constant_term)
 
     def is_parallel_to(self, plane, tolerance=1e-10):
         return self.normal_vector.is_parallel_to(plane.normal_vector,
                                                  tolerance)
 
-    def set_basepoint(self):
-        try:
-            n = self.normal_vector
-            c = self.constant_term
-            basepoint_coords = ['0']*self.dimension
+    def intersection_with(self, plane):
+        """Returns None for parallel distinct hyperplanes and this one
+        for coincident hyperplanes. Otherwise returns the intersection
+        point [x_1, x_2] in two dimensions, and the Parametrization of
+        the intersection in more dimensions"""
+        if self.dimension != plane.dimension:
+            raise Exception(self.DIMENSION_MISMATCH_MSG)
+        if self.is_parallel_to(plane):
+            if self == plane:
+                return self
+            else:
+                return None
+        if self.dimension > 2:
+            # linsys imports this module
+            from linsys import LinearSystem
+            return LinearSystem([self, plane]).solve().parametrization
+        denom = (self.normal_vector[0]*plane.normal_vector[1] -
+                 self.normal_vector[1]*plane.normal_vector[0])
+        x_1 = (plane.normal_vector[1]*self.constant_term -
+               self.normal_vector[1]*plane.constant_term)/denom
+        x_2 = (self.normal_vector[0]*plane.constant_term -
+               plane.normal_vector[0]*self.constant_term)/denom
+        return [x_1, x_2]
 
-            initial_index = Plane.first_nonzero_index(n)
-            initial_coefficient = n[initial_index]
+    def set_basepoint(self):
+        n = self.normal_vector
+        c = self.constant_term
+        basepoint_coords = ['0']*self.dimension
 
-            basepoint_coords[initial_index] = c/initial_coefficient
-            self.basepoint = Vector(basepoint_coords)
+        initial_index = Hyperplane.find_first_nonzero_index(n)
+        if initial_index < 0:
+            self.basepoint = None
+            return
+        initial_coefficient = n[initial_index]
 
-        except Exception as e:
-            if str(e) == Plane.NO_NONZERO_ELTS_FOUND_MSG:
-                self.basepoint = None
-            else:
-                raise e
+        basepoint_coords[initial_index] = c/initial_coefficient
+        self.basepoint = Vector(basepoint_coords, n.backend)
 
     def __eq__(self, plane):
         if self.normal_vector.is_zero():
@@ -58,7 +102,7 @@ class Hyperplane(object):
                 return False
             else:
                 diff = self.constant_term - plane.constant_term
-                return MyDecimal(diff).is_near_zero()
+                return is_near_zero(diff)
         elif plane.normal_vector.is_zero():
             return False
         if not self.is_parallel_to(plane):
@@ -92,8 +136,10 @@ class Hyperplane(object):
 
         n = self.normal_vector
 
-        try:
-            initial_index = Plane.first_nonzero_index(n)
+        initial_index = Hyperplane.find_first_nonzero_index(n)
+        if initial_index < 0:
+            output = '0'
+        else:
             terms = [write_coefficient(n[i],
                      is_initial_term=(i == initial_index))
                      + 'x_{}'.format(i+1)
@@ -101,12 +147,6 @@ class Hyperplane(object):
                      if round(n[i], num_decimal_places) != 0]
             output = ' '.join(terms)
 
-        except Exception as e:
-            if str(e) == self.NO_NONZERO_ELTS_FOUND_MSG:
-                output = '0'
-            else:
-                raise e
-
         constant = round(self.constant_term, num_decimal_places)
         if constant % 1 == 0:
             constant = int(constant)
@@ -115,13 +155,17 @@ class Hyperplane(object):
         return output
 
     @staticmethod
-    def first_nonzero_index(iterable):
+    def find_first_nonzero_index(iterable):
+        """Returns the index of the first non-zero element, or -1 if
+        there is none"""
         for k, item in enumerate(iterable):
-            if not MyDecimal(item).is_near_zero():
+            if not is_near_zero(item):
                 return k
-        raise Exception(Plane.NO_NONZERO_ELTS_FOUND_MSG)
-
+        return -1
 
-class MyDecimal(Decimal):
-    def is_near_zero(self, eps=1e-10):
-        return abs(self) < eps
+    @staticmethod
+    def first_nonzero_index(iterable):
+        index = Hyperplane.find_first_nonzero_index(iterable)
+        if index < 0:
+            raise Exception(Hyperplane.NO_NONZERO_ELTS_FOUND_MSG)
+        return index
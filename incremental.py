@@ -0,0 +1,141 @@
+"""Linear systems that are updated one equation at a time"""
+from decimal import getcontext
+
+from vector import Vector
+from backend import get_backend, is_near_zero
+from linsys import LinearSystem, Parametrization
+
+getcontext().prec = 30
+
+
+class IncrementalLinearSystem(object):
+    """Keeps the reduced row echelon form of the equations added so far.
+
+    add_equation reduces the new equation against the current pivot
+    rows and, if it brings a new pivot, clears that pivot from the other
+    rows: O(n * rank) per equation instead of a new elimination. An
+    equation that reduces to 0 = k with k non-zero makes the system
+    inconsistent right away. Removing an equation that only repeated
+    the others, or contradicted them, is O(1); removing one that holds
+    a pivot rebuilds the form from the remaining equations."""
+    ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG = (
+        LinearSystem.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
+    UNKNOWN_EQUATION_MSG = 'Unknown equation id: {}'
+
+    def __init__(self, dimension, planes=(), backend=None):
+        self.dimension = dimension
+        self.backend = get_backend(backend)
+        self.equations = {}
+        self._next_id = 0
+        self._clear_form()
+        for plane in planes:
+            self.add_equation(plane)
+
+    def _clear_form(self):
+        # pivot variable -> [coefficients..., constant term], with a 1
+        # on the pivot and 0 on every other pivot variable
+        self.pivot_rows = {}
+        # equation id -> pivot variable it introduced
+        self.pivot_of_equation = {}
+        self.redundant_equations = set()
+        self.contradictory_equations = set()
+        self._solution = None
+
+    def __len__(self):
+        return len(self.equations)
+
+    def add_equation(self, plane):
+        """Adds a Plane, Hyperplane or Line and returns its id, which
+        remove_equation accepts"""
+        if plane.normal_vector.dimension != self.dimension:
+            raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
+        equation_id = self._next_id
+        self._next_id += 1
+        self.equations[equation_id] = plane
+        self._insert(equation_id, plane)
+        return equation_id
+
+    def _insert(self, equation_id, plane):
+        convert = self.backend.convert
+        row = [convert(x) for x in plane.normal_vector.coordinates]
+        row.append(convert(plane.constant_term))
+
+        for pivot_var, pivot_row in self.pivot_rows.items():
+            coefficient = row[pivot_var]
+            if coefficient:
+                row = [x - coefficient * y for x, y in zip(row, pivot_row)]
+
+        pivot_var = next((var for var in range(self.dimension)
+                          if not is_near_zero(row[var])), None)
+        self._solution = None
+        if pivot_var is None:
+            if is_near_zero(row[-1]):
+                self.redundant_equations.add(equation_id)
+            else:
+                self.contradictory_equations.add(equation_id)
+            return
+
+        scale = self.backend.one / row[pivot_var]
+        row = [scale * x for x in row]
+        row[pivot_var] = self.backend.one
+        for other_var, other_row in self.pivot_rows.items():
+            coefficient = other_row[pivot_var]
+            if coefficient:
+                reduced = [x - coefficient * y
+                           for x, y in zip(other_row, row)]
+                reduced[pivot_var] = self.backend.zero
+                self.pivot_rows[other_var] = reduced
+        self.pivot_rows[pivot_var] = row
+        self.pivot_of_equation[equation_id] = pivot_var
+
+    def remove_equation(self, equation_id):
+        """Removes the equation with the given id"""
+        try:
+            del self.equations[equation_id]
+        except KeyError:
+            raise KeyError(self.UNKNOWN_EQUATION_MSG.format(equation_id))
+        self._solution = None
+        if equation_id in self.redundant_equations:
+            self.redundant_equations.discard(equation_id)
+        elif equation_id in self.contradictory_equations:
+            self.contradictory_equations.discard(equation_id)
+        else:
+            self._clear_form()
+            for other_id in sorted(self.equations):
+                self._insert(other_id, self.equations[other_id])
+
+    def has_solutions(self):
+        return not self.contradictory_equations
+
+    def rank(self):
+        return len(self.pivot_rows)
+
+    def nullity(self):
+        return self.dimension - self.rank()
+
+    def compute_solution(self):
+        """Returns the Parametrization of the solutions, or
+        LinearSystem.NO_SOLUTIONS_MSG; cached until the next update"""
+        if self.contradictory_equations:
+            return LinearSystem.NO_SOLUTIONS_MSG
+        if self._solution is None:
+            self._solution = self._parametrize()
+        return self._solution
+
+    def _parametrize(self):
+        basepoint_coords = [0] * self.dimension
+        for pivot_var, row in self.pivot_rows.items():
+            basepoint_coords[pivot_var] = row[-1]
+
+        free_variable_indices = sorted(set(range(self.dimension)) -
+                                       set(self.pivot_rows))
+        direction_vectors = []
+        for free_var in free_variable_indices:
+            vector_coords = [0] * self.dimension
+            vector_coords[free_var] = 1
+            for pivot_var, row in self.pivot_rows.items():
+                vector_coords[pivot_var] = -row[free_var]
+            direction_vectors.append(Vector(vector_coords, self.backend))
+
+        return Parametrization(Vector(basepoint_coords, self.backend),
+                               direction_vectors)
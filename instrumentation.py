@@ -0,0 +1,175 @@
+"""Opt-in instrumentation of the elimination pipeline.
+
+solve_with_stats(system) solves like LinearSystem.compute_solution and
+also returns a SolveStats with the number of row operations, the rows
+and vectors allocated and the wall time of every phase. The counting
+lives in InstrumentedAugmentedMatrix, which only this module uses, so
+the usual solves run exactly as before. Blocked and exact systems
+eliminate without these row operations, so they cannot be
+instrumented."""
+import time
+from contextlib import contextmanager
+
+from vector import Vector
+from matrix import (AugmentedMatrix, BlockedAugmentedMatrix,
+                    FractionFreeAugmentedMatrix)
+from linsys import LinearSystem, Parametrization
+
+CANNOT_INSTRUMENT_MSG = 'Cannot instrument the elimination of a {}'
+
+
+class SolveStats(object):
+    """Counters and phase timings of one instrumented solve.
+
+    Every callback is called as callback(event, *details) with the
+    events 'swap_rows' (row1, row2), 'swap_columns' (col1, col2),
+    'scale_row' (coefficient, row), 'add_rows' (coefficient,
+    row_to_add, row_to_be_added_to) and 'phase' (name, seconds)."""
+    PHASES = ('copy', 'triangular_form', 'back_substitution', 'extraction',
+              'parametrization')
+
+    def __init__(self, callbacks=()):
+        self.row_swaps = 0
+        self.column_swaps = 0
+        self.row_scalings = 0
+        self.row_additions = 0
+        # Rows and vectors built along the way
+        self.allocations = 0
+        self.phase_times = {}
+        self.callbacks = list(callbacks)
+
+    @property
+    def row_operations(self):
+        return self.row_swaps + self.row_scalings + self.row_additions
+
+    @property
+    def total_time(self):
+        return sum(self.phase_times.values())
+
+    def notify(self, event, *details):
+        for callback in self.callbacks:
+            callback(event, *details)
+
+    @contextmanager
+    def phase(self, name):
+        """Adds the wall time of the with block to the given phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase_time(name, time.perf_counter() - start)
+
+    def add_phase_time(self, name, seconds):
+        self.phase_times[name] = self.phase_times.get(name, 0) + seconds
+        self.notify('phase', name, seconds)
+
+    def as_dict(self):
+        return {
+            'row_swaps': self.row_swaps,
+            'column_swaps': self.column_swaps,
+            'row_scalings': self.row_scalings,
+            'row_additions': self.row_additions,
+            'row_operations': self.row_operations,
+            'allocations': self.allocations,
+            'phase_times': dict(self.phase_times),
+            'total_time': self.total_time,
+        }
+
+    def __str__(self):
+        ret = 'Solve stats: {} row operations ({} swaps, {} scalings, ' \
+              '{} additions), {} column swaps, {} allocations\n'.format(
+                  self.row_operations, self.row_swaps, self.row_scalings,
+                  self.row_additions, self.column_swaps, self.allocations)
+        for name in self.PHASES:
+            if name in self.phase_times:
+                ret += '{:<18} {:.6f} s\n'.format(name,
+                                                  self.phase_times[name])
+        return ret
+
+
+class InstrumentedAugmentedMatrix(AugmentedMatrix):
+    """Augmented matrix that reports its row operations and the time of
+    the elimination phases to its stats"""
+
+    def __init__(self, rows, dimension, backend=None, stats=None):
+        super(InstrumentedAugmentedMatrix, self).__init__(rows, dimension,
+                                                          backend)
+        self.stats = stats or SolveStats()
+
+    def swap_columns(self, col1, col2):
+        self.stats.column_swaps += 1
+        self.stats.notify('swap_columns', col1, col2)
+        super(InstrumentedAugmentedMatrix, self).swap_columns(col1, col2)
+
+    def swap_rows(self, row1, row2):
+        self.stats.row_swaps += 1
+        self.stats.notify('swap_rows', row1, row2)
+        super(InstrumentedAugmentedMatrix, self).swap_rows(row1, row2)
+
+    def multiply_coefficient_and_row(self, coefficient, row):
+        self.stats.row_scalings += 1
+        self.stats.allocations += 1
+        self.stats.notify('scale_row', coefficient, row)
+        super(InstrumentedAugmentedMatrix,
+              self).multiply_coefficient_and_row(coefficient, row)
+
+    def add_multiple_times_row_to_row(self, coefficient, row_to_add,
+                                      row_to_be_added_to):
+        self.stats.row_additions += 1
+        self.stats.allocations += 1
+        self.stats.notify('add_rows', coefficient, row_to_add,
+                          row_to_be_added_to)
+        super(InstrumentedAugmentedMatrix,
+              self).add_multiple_times_row_to_row(coefficient, row_to_add,
+                                                  row_to_be_added_to)
+
+    def compute_triangular_form(self, pivoting=AugmentedMatrix.
+                                FIRST_NONZERO_PIVOTING):
+        with self.stats.phase('triangular_form'):
+            return super(InstrumentedAugmentedMatrix,
+                         self).compute_triangular_form(pivoting)
+
+    def compute_rref(self, pivoting=AugmentedMatrix.FIRST_NONZERO_PIVOTING):
+        """The rref's own time, without the triangular form, is recorded
+        as the back_substitution phase"""
+        triangular_time = self.stats.phase_times.get('triangular_form', 0)
+        start = time.perf_counter()
+        super(InstrumentedAugmentedMatrix, self).compute_rref(pivoting)
+        triangular_time = (self.stats.phase_times['triangular_form'] -
+                           triangular_time)
+        self.stats.add_phase_time(
+            'back_substitution',
+            time.perf_counter() - start - triangular_time)
+        return self
+
+
+def solve_with_stats(system, pivoting='first', callbacks=()):
+    """Solves the LinearSystem like compute_solution(pivoting) and
+    returns (solution, stats). The callbacks receive the events of
+    SolveStats as they happen. Blocked and exact systems are rejected,
+their own eliminations not being the instrumented one."""
+    if issubclass(system.matrix_class, (BlockedAugmentedMatrix,
+                                        FractionFreeAugmentedMatrix)):
+        raise Exception(CANNOT_INSTRUMENT_MSG.format(
+            system.matrix_class.__name__))
+    stats = SolveStats(callbacks)
+    with stats.phase('copy'):
+        matrix = system.to_augmented_matrix(InstrumentedAugmentedMatrix)
+        matrix.stats = stats
+        stats.allocations += len(matrix)
+
+    rref = matrix.compute_rref(pivoting)
+    with stats.phase('extraction'):
+        if rref.has_contradictory_equation():
+            return LinearSystem.NO_SOLUTIONS_MSG, stats
+        direction_coordinates = (
+            rref.extract_direction_vectors_for_parametrization())
+        basepoint_coordinates = rref.extract_basepoint_for_parametrization()
+
+    with stats.phase('parametrization'):
+        direction_vectors = [Vector(coords, rref.backend)
+                             for coords in direction_coordinates]
+        solution = Parametrization(Vector(basepoint_coordinates,
+                                          rref.backend), direction_vectors)
+        stats.allocations += len(direction_vectors) + 1
+    return solution, stats
@@ -0,0 +1,399 @@
+"""Iterative solvers for large square systems.
+
+Elimination is exact but O(n^3) on dense systems; the solvers here only
+multiply the coefficient matrix by vectors, so a sparse system costs
+O(non-zeros) per iteration. They compute in float64, stop when the
+residual |b - A x| is at most tolerance |b| and return the basepoint
+found with a ConvergenceReport:
+
+* conjugate_gradient for symmetric positive definite systems,
+* gmres (restarted) and bicgstab for general square systems.
+
+All of them take a warm start x0, e.g. the basepoint of the previous
+solve of a slightly perturbed system, and a preconditioner: 'jacobi',
+'ilu' (incomplete LU without fill-in), None, or a preconditioner built
+before, which can be reused while the matrix barely changes."""
+from array import array
+from math import sqrt
+from operator import mul
+
+from vector import Vector
+
+NOT_SQUARE_MSG = 'Iterative solvers need as many equations as unknowns'
+X0_DIMENSION_MISMATCH_MSG = 'The initial guess must have one coordinate ' \
+                            'per unknown'
+ZERO_DIAGONAL_MSG = 'Zero diagonal entry in row {}'
+UNKNOWN_PRECONDITIONER_MSG = 'Unknown preconditioner: {}'
+
+
+class CSRMatrix(object):
+    """Square float64 matrix in compressed sparse row form: the entries
+    of row i are values[indptr[i]:indptr[i + 1]], in the columns
+    indices[indptr[i]:indptr[i + 1]] sorted in increasing order"""
+
+    def __init__(self, indptr, indices, values, dimension):
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values
+        self.dimension = dimension
+
+    @classmethod
+    def from_rows(cls, rows, dimension):
+        """Builds the matrix from rows given as {column: coefficient}
+        dicts or as dense coefficient sequences; zeros are dropped"""
+        if len(rows) != dimension:
+            raise Exception(NOT_SQUARE_MSG)
+        indptr, indices, values = array('q', [0]), array('q'), array('d')
+        for row in rows:
+            items = row.items() if isinstance(row, dict) else enumerate(row)
+            for column, coefficient in sorted(items):
+                coefficient = float(coefficient)
+                if coefficient:
+                    indices.append(column)
+                    values.append(coefficient)
+            indptr.append(len(indices))
+        return cls(indptr, indices, values, dimension)
+
+    def num_nonzeros(self):
+        return len(self.values)
+
+    def matvec(self, x):
+        """Returns A x as a list"""
+        indptr, indices, values = self.indptr, self.indices, self.values
+        return [sum(map(mul, values[indptr[i]:indptr[i + 1]],
+                        [x[j] for j in indices[indptr[i]:indptr[i + 1]]]))
+                for i in range(self.dimension)]
+
+    def diagonal(self):
+        diagonal = [0.0] * self.dimension
+        for i in range(self.dimension):
+            for p in range(self.indptr[i], self.indptr[i + 1]):
+                if self.indices[p] == i:
+                    diagonal[i] = self.values[p]
+        return diagonal
+
+
+def coefficient_matrix(system):
+    """Returns (CSRMatrix, constant terms) of a SparseLinearSystem, a
+    LinearSystem or an AugmentedMatrix"""
+    if hasattr(system, 'constant_terms'):
+        rows, constant_terms = system.rows, system.constant_terms
+    else:
+        matrix = system
+        if hasattr(system, 'to_augmented_matrix'):
+            matrix = system.to_augmented_matrix()
+        # In variable order when complete pivoting reordered the columns
+        rows = [matrix.in_variable_order(row[:-1]) for row in matrix.rows]
+        constant_terms = [row[-1] for row in matrix.rows]
+    return (CSRMatrix.from_rows(rows, system.dimension),
+            [float(k) for k in constant_terms])
+
+
+class JacobiPreconditioner(object):
+    """Divides by the diagonal of the matrix"""
+
+    def __init__(self, matrix):
+        diagonal = matrix.diagonal()
+        for i, d in enumerate(diagonal):
+            if not d:
+                raise Exception(ZERO_DIAGONAL_MSG.format(i))
+        self.inverse_diagonal = [1.0 / d for d in diagonal]
+
+    def apply(self, r):
+        return list(map(mul, self.inverse_diagonal, r))
+
+
+class ILU0Preconditioner(object):
+    """Incomplete LU factorization that keeps the sparsity pattern of
+    the matrix (no fill-in); applying it solves L U z = r"""
+
+    def __init__(self, matrix):
+        n = matrix.dimension
+        self.indptr = indptr = matrix.indptr
+        self.indices = indices = matrix.indices
+        self.values = values = array('d', matrix.values)
+        self.diagonal_positions = diagonal_positions = [-1] * n
+        for i in range(n):
+            positions = {indices[p]: p
+                         for p in range(indptr[i], indptr[i + 1])}
+            diagonal_positions[i] = positions.get(i, -1)
+            if diagonal_positions[i] < 0:
+                raise Exception(ZERO_DIAGONAL_MSG.format(i))
+            for p in range(indptr[i], diagonal_positions[i]):
+                k = indices[p]
+                pivot = values[diagonal_positions[k]]
+                if not pivot:
+                    raise Exception(ZERO_DIAGONAL_MSG.format(k))
+                factor = values[p] = values[p] / pivot
+                for q in range(diagonal_positions[k] + 1, indptr[k + 1]):
+                    target = positions.get(indices[q])
+                    if target is not None:
+                        values[target] -= factor * values[q]
+            if not values[diagonal_positions[i]]:
+                raise Exception(ZERO_DIAGONAL_MSG.format(i))
+
+    def apply(self, r):
+        indptr, indices, values = self.indptr, self.indices, self.values
+        diagonal_positions = self.diagonal_positions
+        n = len(r)
+        # L has a unit diagonal and the entries left of it
+        y = list(r)
+        for i in range(n):
+            start, diagonal = indptr[i], diagonal_positions[i]
+            y[i] -= sum(map(mul, values[start:diagonal],
+                            [y[j] for j in indices[start:diagonal]]))
+        # U is the diagonal and the entries right of it
+        for i in range(n - 1, -1, -1):
+            diagonal, stop = diagonal_positions[i], indptr[i + 1]
+            y[i] = (y[i] - sum(map(mul, values[diagonal + 1:stop],
+                                   [y[j] for j in
+                                    indices[diagonal + 1:stop]]))) / \
+                values[diagonal]
+        return y
+
+
+PRECONDITIONERS = {
+    'jacobi': JacobiPreconditioner,
+    'ilu': ILU0Preconditioner,
+}
+
+
+def make_preconditioner(preconditioner, matrix):
+    """Resolves a preconditioner name (or None) for the matrix; objects
+    with an apply(r) method are returned as they are"""
+    if preconditioner is None or hasattr(preconditioner, 'apply'):
+        return preconditioner
+    try:
+        return PRECONDITIONERS[preconditioner](matrix)
+    except KeyError:
+        raise ValueError(UNKNOWN_PRECONDITIONER_MSG.format(preconditioner))
+
+
+class ConvergenceReport(object):
+    """How an iterative solve went: whether the relative residual
+    |b - A x| / |b| reached the tolerance, after how many iterations,
+    and the relative residual after every iteration"""
+
+    def __init__(self, method, tolerance, max_iterations):
+        self.method = method
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.converged = False
+        self.iterations = 0
+        self.residual_history = []
+        # Set when the method cannot continue, e.g. a zero denominator
+        self.breakdown = None
+
+    @property
+    def relative_residual(self):
+        return self.residual_history[-1]
+
+    def record(self, relative_residual):
+        self.residual_history.append(relative_residual)
+        self.converged = relative_residual <= self.tolerance
+        return self.converged
+
+    def __str__(self):
+        status = 'converged' if self.converged else 'did not converge'
+        ret = '{} {} after {} iterations, relative residual {:.3e}'.format(
+            self.method, status, self.iterations, self.relative_residual)
+        if self.breakdown:
+            ret += ' ({})'.format(self.breakdown)
+        return ret
+
+
+class IterativeSolution(object):
+    """The basepoint found by an iterative solver, a float Vector, and
+    its ConvergenceReport"""
+
+    def __init__(self, basepoint, report):
+        self.basepoint = basepoint
+        self.report = report
+
+    @property
+    def converged(self):
+        return self.report.converged
+
+    def __str__(self):
+        return 'Iterative solution: {}\n{}'.format(self.basepoint.coordinates,
+                                                    self.report)
+
+
+def _dot(x, y):
+    return sum(map(mul, x, y))
+
+
+def _norm(x):
+    return sqrt(_dot(x, x))
+
+
+def _axpy(a, x, y):
+    """Returns a x + y"""
+    return [a * u + v for u, v in zip(x, y)]
+
+
+def _setup(system, x0, preconditioner, method, tolerance, max_iterations):
+    """Returns (matrix, b, x, preconditioner, |b|, report) for a solve"""
+    matrix, b = coefficient_matrix(system)
+    n = matrix.dimension
+    if x0 is None:
+        x = [0.0] * n
+    else:
+        x = [float(c) for c in getattr(x0, 'coordinates', x0)]
+        if len(x) != n:
+            raise Exception(X0_DIMENSION_MISMATCH_MSG)
+    report = ConvergenceReport(method, tolerance, max_iterations or 10 * n)
+    return (matrix, b, x, make_preconditioner(preconditioner, matrix),
+            _norm(b) or 1.0, report)
+
+
+def _residual(matrix, b, x):
+    return [u - v for u, v in zip(b, matrix.matvec(x))]
+
+
+def conjugate_gradient(system, x0=None, tolerance=1e-8, max_iterations=None,
+                       preconditioner=None):
+    """Solves a symmetric positive definite square system with the
+    (preconditioned) conjugate gradient method. max_iterations defaults
+    to 10 times the number of unknowns."""
+    matrix, b, x, preconditioner, b_norm, report = _setup(
+        system, x0, preconditioner, 'CG', tolerance, max_iterations)
+    r = _residual(matrix, b, x)
+    if not report.record(_norm(r) / b_norm):
+        z = preconditioner.apply(r) if preconditioner else r
+        p = z
+        rz = _dot(r, z)
+        while report.iterations < report.max_iterations:
+            report.iterations += 1
+            q = matrix.matvec(p)
+            pq = _dot(p, q)
+            if not pq:
+                report.breakdown = 'p . A p is zero'
+                break
+            alpha = rz / pq
+            x = _axpy(alpha, p, x)
+            r = _axpy(-alpha, q, r)
+            if report.record(_norm(r) / b_norm):
+                break
+            z = preconditioner.apply(r) if preconditioner else r
+            rz, previous_rz = _dot(r, z), rz
+            p = _axpy(rz / previous_rz, p, z)
+    return IterativeSolution(Vector(x, 'float'), report)
+
+
+def bicgstab(system, x0=None, tolerance=1e-8, max_iterations=None,
+             preconditioner=None):
+    """Solves a general square system with the (right preconditioned)
+    biconjugate gradient stabilized method"""
+    matrix, b, x, preconditioner, b_norm, report = _setup(
+        system, x0, preconditioner, 'BiCGSTAB', tolerance, max_iterations)
+
+    def apply(v):
+        return preconditioner.apply(v) if preconditioner else v
+
+    r = _residual(matrix, b, x)
+    if not report.record(_norm(r) / b_norm):
+        shadow = list(r)
+        rho = alpha = omega = 1.0
+        v = p = [0.0] * len(x)
+        while report.iterations < report.max_iterations:
+            report.iterations += 1
+            rho, previous_rho = _dot(shadow, r), rho
+            if not rho or not omega:
+                report.breakdown = 'rho or omega is zero'
+                break
+            beta = (rho / previous_rho) * (alpha / omega)
+            p = [ri + beta * (pi - omega * vi)
+                 for ri, pi, vi in zip(r, p, v)]
+            p_hat = apply(p)
+            v = matrix.matvec(p_hat)
+            shadow_v = _dot(shadow, v)
+            if not shadow_v:
+                report.breakdown = 'shadow residual orthogonal to A p'
+                break
+            alpha = rho / shadow_v
+            s = _axpy(-alpha, v, r)
+            if report.record(_norm(s) / b_norm):
+                x = _axpy(alpha, p_hat, x)
+                break
+            s_hat = apply(s)
+            t = matrix.matvec(s_hat)
+            tt = _dot(t, t)
+            omega = _dot(t, s) / tt if tt else 0.0
+            x = [xi + alpha * pi + omega * si
+                 for xi, pi, si in zip(x, p_hat, s_hat)]
+            r = _axpy(-omega, t, s)
+            if report.record(_norm(r) / b_norm):
+                break
+    return IterativeSolution(Vector(x, 'float'), report)
+
+
+def gmres(system, x0=None, tolerance=1e-8, max_iterations=None,
+          preconditioner=None, restart=30):
+    """Solves a general square system with the (right preconditioned)
+    GMRES method, restarted every restart iterations to bound the
+    memory to restart vectors"""
+    matrix, b, x, preconditioner, b_norm, report = _setup(
+        system, x0, preconditioner, 'GMRES', tolerance, max_iterations)
+
+    def apply(v):
+        return preconditioner.apply(v) if preconditioner else v
+
+    r = _residual(matrix, b, x)
+    beta = _norm(r)
+    report.record(beta / b_norm)
+    while not report.converged and \
+            report.iterations < report.max_iterations and beta:
+        # Arnoldi with modified Gram-Schmidt; the least squares problem
+        # min |beta e_1 - H y| is kept triangular with Givens rotations
+        basis = [[ri / beta for ri in r]]
+        hessenberg = []
+        cosines, sines = [], []
+        g = [beta]
+        for j in range(min(restart, report.max_iterations -
+                           report.iterations)):
+            report.iterations += 1
+            w = matrix.matvec(apply(basis[j]))
+            column = []
+            for v in basis:
+                h = _dot(w, v)
+                w = _axpy(-h, v, w)
+                column.append(h)
+            w_norm = _norm(w)
+            column.append(w_norm)
+            for i in range(j):
+                column[i], column[i + 1] = (
+                    cosines[i] * column[i] + sines[i] * column[i + 1],
+                    -sines[i] * column[i] + cosines[i] * column[i + 1])
+            denom = sqrt(column[j] ** 2 + column[j + 1] ** 2)
+            if not denom:
+                report.breakdown = 'singular Hessenberg matrix'
+                break
+            cosines.append(column[j] / denom)
+            sines.append(column[j + 1] / denom)
+            column[j], column[j + 1] = denom, 0.0
+            g.append(-sines[j] * g[j])
+            g[j] = cosines[j] * g[j]
+            hessenberg.append(column)
+            converged = report.record(abs(g[j + 1]) / b_norm)
+            if converged or not w_norm:
+                break
+            basis.append([wi / w_norm for wi in w])
+
+        # Back substitution of the triangular system, then
+        # x += M^-1 (basis y)
+        k = len(hessenberg)
+        y = [0.0] * k
+        for i in range(k - 1, -1, -1):
+            y[i] = (g[i] - sum(hessenberg[m][i] * y[m]
+                               for m in range(i + 1, k))) / hessenberg[i][i]
+        update = [0.0] * len(x)
+        for i in range(k):
+            update = _axpy(y[i], basis[i], update)
+        x = [xi + ui for xi, ui in zip(x, apply(update))]
+        r = _residual(matrix, b, x)
+        beta = _norm(r)
+        # The true residual replaces the estimate of the rotations
+        report.residual_history[-1] = beta / b_norm
+        report.converged = beta / b_norm <= tolerance
+    return IterativeSolution(Vector(x, 'float'), report)
@@ -0,0 +1,270 @@
+"""Bulk intersection of 2D lines and segments on float64 arrays"""
+import heapq
+from array import array
+from math import sqrt
+
+from vector import Vector
+from line import Line
+
+
+class LineIntersections(object):
+    """Pairwise intersections as parallel arrays: for the n-th pair,
+    first[n] < second[n] are the indices of the lines (or segments),
+    kinds[n] is POINT, PARALLEL or COINCIDENT and (x[n], y[n]) is the
+    intersection point, NaN unless kinds[n] is POINT"""
+    POINT = 0
+    PARALLEL = 1
+    COINCIDENT = 2
+
+    def __init__(self):
+        self.first = array('q')
+        self.second = array('q')
+        self.kinds = array('b')
+        self.x = array('d')
+        self.y = array('d')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __str__(self):
+        return 'LineIntersections: {} points, {} parallel, {} ' \
+               'coincident'.format(self.kinds.count(self.POINT),
+                                   self.kinds.count(self.PARALLEL),
+                                   self.kinds.count(self.COINCIDENT))
+
+    def append(self, first, second, kind, x=float('nan'), y=float('nan')):
+        self.first.append(first)
+        self.second.append(second)
+        self.kinds.append(kind)
+        self.x.append(x)
+        self.y.append(y)
+
+    def points(self):
+        """Yields (first, second, x, y) for the pairs meeting in a point"""
+        for n, kind in enumerate(self.kinds):
+            if kind == self.POINT:
+                yield self.first[n], self.second[n], self.x[n], self.y[n]
+
+    def pairs(self, kind):
+        """Returns the (first, second) pairs of the given kind"""
+        return [(self.first[n], self.second[n])
+                for n, k in enumerate(self.kinds) if k == kind]
+
+
+class LineArray(object):
+    """N lines a x + b y = k stored as three array('d'). The zero
+    vector is parallel to every normal vector, so a line with a zero
+    normal vector is parallel to every line, and coincident with the
+    other such lines with the same constant term."""
+    ONLY_DEFINED_IN_TWO_DIMS_MSG = 'Line arrays are only defined in ' \
+                                   'two dimensions'
+
+    def __init__(self, a, b, k):
+        self.a = a if isinstance(a, array) else array('d', a)
+        self.b = b if isinstance(b, array) else array('d', b)
+        self.k = k if isinstance(k, array) else array('d', k)
+        if not len(self.a) == len(self.b) == len(self.k):
+            raise ValueError('The coefficient arrays must have the same '
+                             'length')
+
+    @classmethod
+    def from_lines(cls, lines):
+        """Packs a sequence of 2D Lines"""
+        a, b, k = array('d'), array('d'), array('d')
+        for line in lines:
+            if line.normal_vector.dimension != 2:
+                raise Exception(cls.ONLY_DEFINED_IN_TWO_DIMS_MSG)
+            a.append(float(line.normal_vector[0]))
+            b.append(float(line.normal_vector[1]))
+            k.append(float(line.constant_term))
+        return cls(a, b, k)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Packs a sequence of rows [a, b, k]"""
+        a, b, k = zip(*rows) if rows else ((), (), ())
+        return cls(a, b, k)
+
+    def __len__(self):
+        return len(self.a)
+
+    def __getitem__(self, i):
+        return Line(Vector([self.a[i], self.b[i]], 'float'), self.k[i])
+
+    def intersections(self, bbox=None, tolerance=1e-10):
+        """Returns the LineIntersections of all pairs of lines.
+
+        Without a bbox every pair is reported, as POINT, PARALLEL or
+        COINCIDENT. With bbox=(x_min, y_min, x_max, y_max) only the
+        pairs meeting inside the box are: the lines are clipped to the
+        box and the segments intersected with segment_intersections,
+        so lines that miss the box are never paired. Lines are parallel
+        when the sine of the angle of their normals is below the
+        tolerance, and coincident when, moreover, their distances to
+        the origin differ by at most the tolerance. Both ways classify
+        coincident lines the same, even when they only cross the box at
+        a corner."""
+        a, b, k = self.a, self.b, self.k
+        norms = [sqrt(x * x + y * y) for x, y in zip(a, b)]
+        if bbox is not None:
+            indices, segments = self.clipped_to(bbox, tolerance)
+            result = segment_intersections(segments, tolerance)
+            for n in range(len(result)):
+                i, j = indices[result.first[n]], indices[result.second[n]]
+                i, j = min(i, j), max(i, j)
+                result.first[n], result.second[n] = i, j
+                if self._parallel(i, j, norms, tolerance) and \
+                        self._coincident(i, j, norms, tolerance):
+                    result.kinds[n] = LineIntersections.COINCIDENT
+                    result.x[n] = result.y[n] = float('nan')
+            return result
+
+        result = LineIntersections()
+        nan = float('nan')
+        for i in range(len(a)):
+            a_i, b_i, k_i, norm_i = a[i], b[i], k[i], norms[i]
+            for j in range(i + 1, len(a)):
+                det = a_i * b[j] - b_i * a[j]
+                if abs(det) > tolerance * norm_i * norms[j]:
+                    # Cramer's rule
+                    result.append(i, j, LineIntersections.POINT,
+                                  (b[j] * k_i - b_i * k[j]) / det,
+                                  (a_i * k[j] - a[j] * k_i) / det)
+                elif self._coincident(i, j, norms, tolerance):
+                    result.append(i, j, LineIntersections.COINCIDENT,
+                                  nan, nan)
+                else:
+                    result.append(i, j, LineIntersections.PARALLEL,
+                                  nan, nan)
+        return result
+
+    def _parallel(self, i, j, norms, tolerance):
+        """Checks if the lines i and j are parallel"""
+        det = self.a[i] * self.b[j] - self.b[i] * self.a[j]
+        return abs(det) <= tolerance * norms[i] * norms[j]
+
+    def _coincident(self, i, j, norms, tolerance):
+        """Checks if the parallel lines i and j coincide"""
+        if norms[i] < tolerance or norms[j] < tolerance:
+            return (norms[i] < tolerance and norms[j] < tolerance and
+                    abs(self.k[i] - self.k[j]) < tolerance)
+        same_direction = self.a[i] * self.a[j] + self.b[i] * self.b[j] > 0
+        offset_j = self.k[j] / norms[j]
+        return abs(self.k[i] / norms[i] -
+                   (offset_j if same_direction else -offset_j)) <= tolerance
+
+    def clipped_to(self, bbox, tolerance=1e-10):
+        """Clips the lines to the box (x_min, y_min, x_max, y_max) and
+        returns (indices, segments) for the lines crossing it, every
+        segment being ((x1, y1), (x2, y2))"""
+        x_min, y_min, x_max, y_max = bbox
+        indices, segments = array('q'), []
+        for i, (a, b, k) in enumerate(zip(self.a, self.b, self.k)):
+            squared_norm = a * a + b * b
+            if squared_norm < tolerance * tolerance:
+                continue
+            # The line is p + t d with p its point closest to the origin
+            p_x, p_y = a * k / squared_norm, b * k / squared_norm
+            d_x, d_y = -b, a
+            t_min, t_max = float('-inf'), float('inf')
+            for p, d, low, high in ((p_x, d_x, x_min, x_max),
+                                    (p_y, d_y, y_min, y_max)):
+                if d == 0:
+                    if not low - tolerance <= p <= high + tolerance:
+                        break
+                    continue
+                t1, t2 = (low - p) / d, (high - p) / d
+                t_min = max(t_min, min(t1, t2))
+                t_max = min(t_max, max(t1, t2))
+            else:
+                # A line through a corner is clipped to a point
+                if t_min <= t_max + tolerance / sqrt(squared_norm):
+                    t_max = max(t_min, t_max)
+                    indices.append(i)
+                    segments.append(((p_x + t_min * d_x, p_y + t_min * d_y),
+                                     (p_x + t_max * d_x, p_y + t_max * d_y)))
+        return indices, segments
+
+
+def segment_intersections(segments, tolerance=1e-10):
+    """Returns the LineIntersections of the pairs of segments
+    ((x1, y1), (x2, y2)) that meet: a POINT, or COINCIDENT for
+    overlapping collinear segments.
+
+    A sweep line moves along x over the segments sorted by their left
+    end and keeps the segments it crosses in a heap by their right end,
+    so a segment is only tested against the ones overlapping it in x
+    (and, before the exact test, in y)."""
+    order = sorted(range(len(segments)),
+                   key=lambda i: min(segments[i][0][0], segments[i][1][0]))
+    result = LineIntersections()
+    active = []
+    for i in order:
+        (x1, y1), (x2, y2) = segments[i]
+        left, right = min(x1, x2), max(x1, x2)
+        bottom, top = min(y1, y2), max(y1, y2)
+        while active and active[0][0] < left - tolerance:
+            heapq.heappop(active)
+        for _, j, other_bottom, other_top in active:
+            if other_top < bottom - tolerance or other_bottom > top + \
+                    tolerance:
+                continue
+            _intersect_segments(result, min(i, j), max(i, j), segments,
+                                tolerance)
+        heapq.heappush(active, (right, i, bottom, top))
+    return result
+
+
+def _intersect_segments(result, i, j, segments, tolerance):
+    """Appends the intersection of the segments i and j, if any"""
+    (p_x, p_y), (end_x, end_y) = segments[i]
+    (q_x, q_y), (other_x, other_y) = segments[j]
+    r_x, r_y = end_x - p_x, end_y - p_y
+    s_x, s_y = other_x - q_x, other_y - q_y
+    w_x, w_y = q_x - p_x, q_y - p_y
+    denom = r_x * s_y - r_y * s_x
+    r_norm, s_norm = sqrt(r_x * r_x + r_y * r_y), sqrt(s_x * s_x + s_y * s_y)
+    if r_norm <= tolerance or s_norm <= tolerance:
+        # A segment reduced to a point meets the other one if it lies
+        # on it
+        if r_norm > s_norm:
+            point, start, direction, norm = (q_x, q_y), (p_x, p_y), \
+                (r_x, r_y), r_norm
+        else:
+            point, start, direction, norm = (p_x, p_y), (q_x, q_y), \
+                (s_x, s_y), s_norm
+        if _distance_to_segment(point, start, direction, norm) <= tolerance:
+            result.append(i, j, LineIntersections.POINT, *point)
+        return
+    if abs(denom) > tolerance * r_norm * s_norm:
+        t = (w_x * s_y - w_y * s_x) / denom
+        u = (w_x * r_y - w_y * r_x) / denom
+        # Relative to the segment lengths, so that segments meeting at
+        # an end point are found
+        t_slack = tolerance / r_norm if r_norm else 0.0
+        u_slack = tolerance / s_norm if s_norm else 0.0
+        if -t_slack <= t <= 1 + t_slack and -u_slack <= u <= 1 + u_slack:
+            result.append(i, j, LineIntersections.POINT,
+                          p_x + t * r_x, p_y + t * r_y)
+        return
+    # Parallel: coincident when q is on the line of p and the
+    # projections on it overlap
+    if abs(w_x * r_y - w_y * r_x) > tolerance * r_norm:
+        return
+    squared_norm = r_norm * r_norm
+    t0 = (w_x * r_x + w_y * r_y) / squared_norm
+    t1 = t0 + (s_x * r_x + s_y * r_y) / squared_norm
+    slack = tolerance / r_norm
+    if min(t0, t1) <= 1 + slack and max(t0, t1) >= -slack:
+        result.append(i, j, LineIntersections.COINCIDENT,
+                      float('nan'), float('nan'))
+
+
+def _distance_to_segment(point, start, direction, norm):
+    w_x, w_y = point[0] - start[0], point[1] - start[1]
+    if not norm:
+        return sqrt(w_x * w_x + w_y * w_y)
+    t = max(0.0, min(1.0, (w_x * direction[0] + w_y * direction[1]) /
+                     (norm * norm)))
+    d_x, d_y = w_x - t * direction[0], w_y - t * direction[1]
+    return sqrt(d_x * d_x + d_y * d_y)
@@ -1,13 +1,24 @@
-from decimal import Decimal, getcontext
-from copy import deepcopy
+from decimal import getcontext
+from enum import Enum
 from vector import Vector
-from plane import Plane
-from hyperplane import Hyperplane
+from matrix import (AugmentedMatrix, BlockedAugmentedMatrix,
+                    FractionFreeAugmentedMatrix, RecordingAugmentedMatrix)
+from backend import is_near_zero
+from spatial_index import HyperplaneIndex
 
 getcontext().prec = 30
 
 
 class LinearSystem(object):
+    """A system of linear equations. The system is either backed by
+    its list of planes or, for systems produced by the elimination, by
+    an AugmentedMatrix; in that case the planes are only built (and the
+    matrix released) when they are first accessed.
+
+    Systems produced by the elimination remember its pivot variables,
+    so pivot lookups, rank() and nullity() do not rescan the planes.
+    The record is dropped when rows are replaced or swapped through the
+    system (not when the planes list is mutated directly)"""
 
     ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG = 'All planes in the system should live\
     in the same dimension'
@@ -26,14 +37,54 @@ class LinearSystem(object):
         except AssertionError:
             raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
 
+    @classmethod
+    def from_matrix(cls, matrix):
+        """Wraps an AugmentedMatrix without building its planes"""
+        system = cls.__new__(cls)
+        system._planes = None
+        system._matrix = matrix
+        system.dimension = matrix.dimension
+        system._pivot_indices = None
+        if matrix.pivot_columns is not None:
+            system._pivot_indices = matrix.pivot_variables()
+        return system
+
+    @property
+    def planes(self):
+        if self._planes is None:
+            self._planes = self._matrix.to_planes()
+            self._matrix = None
+        return self._planes
+
+    @planes.setter
+    def planes(self, planes):
+        self._planes = planes
+        self._matrix = None
+        self._pivot_indices = None
+
+    @property
+    def backend(self):
+        """The numeric backend of the system's coefficients"""
+        if self._planes is None:
+            return self._matrix.backend
+        return self._planes[0].normal_vector.backend
+
+    @property
+    def matrix_class(self):
+        """The AugmentedMatrix class the eliminations run on"""
+        if self._matrix is None:
+            return AugmentedMatrix
+        return type(self._matrix)
+
     def swap_rows(self, row1, row2):
         self.planes[row1], self.planes[row2] = (self.planes[row2],
                                                 self.planes[row1])
+        self._pivot_indices = None
 
     def multiply_coefficient_and_row(self, coefficient, row):
         normal_vector = self[row].normal_vector.times_scalar(coefficient)
         constant_term = self[row].constant_term * coefficient
-        self[row] = Plane(normal_vector, constant_term)
+        self[row] = self[row].with_equation(normal_vector, constant_term)
 
     def add_multiple_times_row_to_row(self, coefficient, row_to_add,
                                       row_to_be_added_to):
@@ -43,47 +94,46 @@ class LinearSystem(object):
         k2 = self[row_to_be_added_to].constant_term
         new_normal_vector = n1.times_scalar(coefficient).plus(n2)
         new_constant_term = (k1 * coefficient) + k2
-        self[row_to_be_added_to] = Plane(new_normal_vector, new_constant_term)
+        self[row_to_be_added_to] = self[row_to_be_added_to].with_equation(
+            new_normal_vector, new_constant_term)
 
     def indices_of_first_nonzero_terms_in_each_row(self):
+        if self._pivot_indices is not None:
+            return list(self._pivot_indices)
+
         num_equations = len(self)
         num_variables = self.dimension
 
         indices = [-1] * num_equations
         for i, p in enumerate(self.planes):
-            try:
-                indices[i] = p.first_nonzero_index(p.normal_vector)
-            except Exception as e:
-                if str(e) == Plane.NO_NONZERO_ELTS_FOUND_MSG:
-                    continue
-                else:
-                    raise e
+            indices[i] = p.find_first_nonzero_index(p.normal_vector)
 
         return indices
 
-    def compute_triangular_form(self):
-        system = deepcopy(self)
-        col = 0
-        for row in range(len(system)):
-            while col < system.dimension:
-                c = MyDecimal(system[row].normal_vector.coordinates[col])
-                if c.is_near_zero():
-                    swap_with_index = (next((row2 for row2, plane in enumerate(system)
-                                            if row2 > row and
-                                             not MyDecimal(plane.normal_vector.coordinates[col]).is_near_zero()), None))
-                    # Gets the first plane with a non-zero value at dimension i
-                    if swap_with_index:
-                        system.swap_rows(row, swap_with_index)
-                    else:
-                        col += 1
-                        continue
-                for row2 in range(row+1, len(system)):
-                    coefficient = - system[row2].normal_vector[col]/system[row].normal_vector[col]
-                    system.add_multiple_times_row_to_row(coefficient, row, row2)
-                # Sets all the following rows to zero
-                col += 1
-                break
-        return system
+    def rank(self, pivoting='first'):
+        """Returns the number of independent equations, using the
+        recorded pivots or else a triangular form (no full solve)"""
+        if self._pivot_indices is None:
+            return self.compute_triangular_form(pivoting).rank()
+        return sum(1 for index in self._pivot_indices if index >= 0)
+
+    def nullity(self, pivoting='first'):
+        """Returns the number of free variables"""
+        return self.dimension - self.rank(pivoting)
+
+    def free_variables(self, pivoting='first'):
+        """Returns the sorted indices of the free variables"""
+        if self._pivot_indices is None:
+            return self.compute_triangular_form(pivoting).free_variables()
+        return sorted(set(range(self.dimension)) - set(self._pivot_indices))
+
+    def compute_triangular_form(self, pivoting='first', inplace=False):
+        """Returns the system in triangular form. With inplace=True the
+        elimination reuses this system's storage and returns it, so
+        only one copy of the coefficients is alive"""
+        matrix = self._matrix_for_elimination(inplace)
+        return self._with_matrix(matrix.compute_triangular_form(pivoting),
+                                 inplace)
 
 # Used the function from solution. Debug later.
 #     def compute_rref_my_old_func(self):
@@ -97,23 +147,81 @@ class LinearSystem(object):
 #                 tf.clear_coefficients_above(i, j)
 #         return tf
 
-    def compute_rref(self):
-        tf = self.compute_triangular_form()
-
-        num_equations = len(tf)
-        pivot_indices = tf.indices_of_first_nonzero_terms_in_each_row()
-
-        for row in range(num_equations)[::-1]:
-            pivot_var = pivot_indices[row]
-            if pivot_var < 0:
-                continue
-            tf.scale_row_to_make_coefficient_equal_one(row, pivot_var)
-            tf.clear_coefficients_above(row, pivot_var)
-
-        return tf
+    def compute_rref(self, pivoting='first', inplace=False):
+        """Returns the system in reduced row echelon form. The pivoting
+        strategy is one of AugmentedMatrix.PIVOTING_STRATEGIES; with
+        'complete' pivoting the rows are only reduced up to a
+        reordering of the variables. inplace works as for
+        compute_triangular_form"""
+        matrix = self._matrix_for_elimination(inplace)
+        return self._with_matrix(matrix.compute_rref(pivoting), inplace)
+
+    def factorize(self, pivoting='first'):
+        """Factors the coefficients once so that the system can be
+        solved for many constant terms, see LUFactorization"""
+        rref = self.to_augmented_matrix(RecordingAugmentedMatrix)
+        return LUFactorization(rref.compute_rref(pivoting))
+
+    def to_augmented_matrix(self, matrix_class=None):
+        """Copies the system into an AugmentedMatrix that the
+        elimination can run on in place. A matrix-backed system keeps
+        its matrix class unless another one is given"""
+        if self._planes is None:
+            return self._matrix.copy(matrix_class)
+        return (matrix_class or AugmentedMatrix).from_planes(self._planes)
+
+    def blocked(self, block_size=64):
+        """Returns a copy of the system with float coefficients, whose
+        eliminations run panel by panel, see BlockedAugmentedMatrix"""
+        matrix = self.to_augmented_matrix()
+        blocked = BlockedAugmentedMatrix(matrix.rows, matrix.dimension,
+                                         block_size=block_size)
+        blocked.plane_class = matrix.plane_class
+        return LinearSystem.from_matrix(blocked)
+
+    def exact(self):
+        """Returns a copy of the system with exact rational
+        coefficients, whose eliminations use fraction-free (Bareiss)
+        elimination and no tolerance, see FractionFreeAugmentedMatrix"""
+        return LinearSystem.from_matrix(
+            self.to_augmented_matrix(FractionFreeAugmentedMatrix))
+
+    def deduplicated(self, tolerance=1e-10):
+        """Returns a copy of the system without the equations that
+        describe the same hyperplane as an earlier one (and without
+        repeated 0 = 0 or 0 = k rows), found by a HyperplaneIndex in
+        about linear time. The solutions are unchanged and the
+        elimination has fewer rows to process. Exact (fraction) systems
+        only drop exactly coincident equations"""
+        matrix = self.to_augmented_matrix()
+        index = HyperplaneIndex(matrix.rows, tolerance,
+                                exact=not matrix.backend.eps)
+        matrix.rows = index.unique()
+        matrix.pivot_columns = None
+        return LinearSystem.from_matrix(matrix)
+
+    def _matrix_for_elimination(self, inplace):
+        """Returns a matrix the elimination may modify: a copy, or
+        with inplace=True this system's own storage. The system keeps
+        that matrix, so it stays usable if the elimination raises"""
+        if not inplace:
+            return self.to_augmented_matrix()
+        if self._matrix is None:
+            self._matrix = self.to_augmented_matrix()
+            self._planes = None
+        self._pivot_indices = None
+        return self._matrix
+
+    def _with_matrix(self, matrix, inplace):
+        if not inplace:
+            return LinearSystem.from_matrix(matrix)
+        self._matrix = matrix
+        self._pivot_indices = matrix.pivot_variables()
+        return self
 
     def scale_row_to_make_coefficient_equal_one(self, row, col):
-        coefficient = Decimal('1.0') / self[row].normal_vector.coordinates[col]
+        normal_vector = self[row].normal_vector
+        coefficient = normal_vector.backend.one / normal_vector.coordinates[col]
         self.multiply_coefficient_and_row(coefficient, row)
 
     def clear_coefficients_above(self, row, col):
@@ -123,15 +231,34 @@ class LinearSystem(object):
             # the coefficient
             self.add_multiple_times_row_to_row(alpha, row, k)
 
-    def compute_solution(self):
-        try:
-            return self.do_gaussian_elimination_and_parametrize_solution()
-        except Exception as e:
-            if(str(e) == self.NO_SOLUTIONS_MSG or
-                    str(e) == self.INF_SOLUTIONS_MSG):
-                return str(e)
-            else:
-                raise e
+    def solve(self, pivoting='first', inplace=False):
+        """Returns a SolveResult; degenerate systems are reported
+        through its status, without raising. With inplace=True the
+        system is left in reduced row echelon form instead of being
+        copied"""
+        rref = self._matrix_for_elimination(inplace).compute_rref(pivoting)
+        if inplace:
+            self._with_matrix(rref, inplace)
+        if rref.has_contradictory_equation():
+            return SolveResult(SolutionStatus.NO_SOLUTIONS)
+
+        direction_vectors = [
+            Vector(coords, rref.backend) for coords in
+            rref.extract_direction_vectors_for_parametrization()]
+        basepoint = Vector(rref.extract_basepoint_for_parametrization(),
+                           rref.backend)
+        status = (SolutionStatus.INFINITE_SOLUTIONS if direction_vectors
+                  else SolutionStatus.UNIQUE_SOLUTION)
+        return SolveResult(status,
+                           Parametrization(basepoint, direction_vectors))
+
+    def compute_solution(self, pivoting='first', inplace=False):
+        """Returns the Parametrization of the solutions, or
+        NO_SOLUTIONS_MSG. inplace works as for solve"""
+        result = self.solve(pivoting, inplace)
+        if result.status is SolutionStatus.NO_SOLUTIONS:
+            return self.NO_SOLUTIONS_MSG
+        return result.parametrization
 
     def do_gaussian_elimination_and_extract_solution(self):
         rref = self.compute_rref()
@@ -141,19 +268,13 @@ class LinearSystem(object):
 
         num_variables = rref.dimension
         solution_coordinates = [rref.planes[i].constant_term for i in range(num_variables)]
-        return Vector(solution_coordinates)
+        return Vector(solution_coordinates, rref.backend)
 
     def raise_exception_if_contradictory_equation(self):
         for p in self.planes:
-            try:
-                p.first_nonzero_index(p.normal_vector)
-            except Exception as e:
-                if str(e) == 'No nonzero elements found':
-                    constant_term = MyDecimal(p.constant_term)
-                    if not constant_term.is_near_zero():
-                        raise Exception(self.NO_SOLUTIONS_MSG)
-                else:
-                    raise e
+            if (p.find_first_nonzero_index(p.normal_vector) < 0 and
+                    not is_near_zero(p.constant_term)):
+                raise Exception(self.NO_SOLUTIONS_MSG)
 
     def raise_exception_if_too_few_pivots(self):
         pivot_indices = self.indices_of_first_nonzero_terms_in_each_row()
@@ -173,13 +294,15 @@ class LinearSystem(object):
     #                 params[col][row] = - self[row].normal_vector.coordinates[col]
     #     return params
 
-    def do_gaussian_elimination_and_parametrize_solution(self):
-        rref = self.compute_rref()
-        rref.raise_exception_if_contradictory_equation()
-        direction_vectors = rref.extract_direction_vectors_for_parametrization()
-        basepoint = rref.extract_basepoint_for_parametrization()
-
-        return Parametrization(basepoint, direction_vectors)
+    def do_gaussian_elimination_and_parametrize_solution(self,
+                                                         pivoting='first',
+                                                         inplace=False):
+        """Raising version of solve: returns the Parametrization or
+        raises Exception(NO_SOLUTIONS_MSG)"""
+        result = self.solve(pivoting, inplace)
+        if result.status is SolutionStatus.NO_SOLUTIONS:
+            raise Exception(self.NO_SOLUTIONS_MSG)
+        return result.parametrization
 
     def extract_direction_vectors_for_parametrization(self):
         num_variables = self.dimension
@@ -197,7 +320,7 @@ class LinearSystem(object):
                     break
                 vector_coords[pivot_var] = -plane.normal_vector[free_var]
 
-            direction_vectors.append(Vector(vector_coords))
+            direction_vectors.append(Vector(vector_coords, self.backend))
 
         return direction_vectors
 
@@ -216,11 +339,13 @@ class LinearSystem(object):
                 break
             basepoint_coords[pivot_var] = plane.constant_term
 
-        return Vector(basepoint_coords)
+        return Vector(basepoint_coords, self.backend)
 
 
     def __len__(self):
-        return len(self.planes)
+        if self._planes is None:
+            return len(self._matrix)
+        return len(self._planes)
 
     def __getitem__(self, i):
         return self.planes[i]
@@ -229,6 +354,7 @@ class LinearSystem(object):
         try:
             assert x.dimension == self.dimension
             self.planes[i] = x
+            self._pivot_indices = None
 
         except AssertionError:
             raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
@@ -241,9 +367,34 @@ class LinearSystem(object):
         return ret
 
 
-class MyDecimal(Decimal):
-    def is_near_zero(self, eps=1e-10):
-        return abs(self) < eps
+class SolutionStatus(Enum):
+    """Outcome of LinearSystem.solve; the values are the messages the
+    string based API returns"""
+    UNIQUE_SOLUTION = 'Unique solution'
+    INFINITE_SOLUTIONS = LinearSystem.INF_SOLUTIONS_MSG
+    NO_SOLUTIONS = LinearSystem.NO_SOLUTIONS_MSG
+
+
+class SolveResult(object):
+    """Result of LinearSystem.solve: a SolutionStatus, and the
+    Parametrization of the solutions (None when there are none)"""
+    __slots__ = ('status', 'parametrization')
+
+    def __init__(self, status, parametrization=None):
+        self.status = status
+        self.parametrization = parametrization
+
+    def has_solutions(self):
+        return self.status is not SolutionStatus.NO_SOLUTIONS
+
+    def is_unique(self):
+        return self.status is SolutionStatus.UNIQUE_SOLUTION
+
+    def __str__(self):
+        if self.parametrization is None:
+            return self.status.value
+        return str(self.parametrization)
+
 
 class Parametrization(object):
 
@@ -274,4 +425,76 @@ class Parametrization(object):
                 output += '+ {} t_{}'.format(round(vector[coord], 3),
                                              free_var + 1)
             output += '\n'
-        return output
\ No newline at end of file
+        return output
+
+
+class LUFactorization(object):
+    """Gaussian elimination of a system's coefficients, kept in product
+    form: the recorded row swaps (P), the eliminations below the pivots
+    (L) and the scalings and eliminations above them (U). Replaying
+    them on a new constant term costs O(n^2) and gives the same result
+    as compute_solution on the system with those constant terms"""
+
+    CONSTANT_TERMS_SIZE_MISMATCH_MSG = (
+        'There must be one constant term per equation')
+
+    def __init__(self, rref):
+        self.rref = rref
+        self.operations = rref.operations
+        self.num_equations = len(rref)
+        self.dimension = rref.dimension
+        self.backend = rref.backend
+        self.pivot_indices = rref.pivot_indices()
+        self.direction_vectors = [
+            Vector(coords, self.backend) for coords in
+            rref.extract_direction_vectors_for_parametrization()]
+
+    def solve(self, constant_terms):
+        """Returns the Parametrization of the solutions for the given
+        constant terms, or LinearSystem.NO_SOLUTIONS_MSG"""
+        return self.solve_many([constant_terms])[0]
+
+    def solve_many(self, constant_terms_list):
+        """Solves for every sequence of constant terms at once and
+        returns the results in the same order"""
+        convert = self.backend.convert
+        zero = self.backend.zero
+        for constant_terms in constant_terms_list:
+            if len(constant_terms) != self.num_equations:
+                raise Exception(self.CONSTANT_TERMS_SIZE_MISMATCH_MSG)
+        # One list per equation holding that row's constant terms
+        rows = [[convert(terms[row]) or zero
+                 for terms in constant_terms_list]
+                for row in range(self.num_equations)]
+        self._replay(rows)
+        return [self._parametrize([row[k] for row in rows])
+                for k in range(len(constant_terms_list))]
+
+    def _replay(self, rows):
+        zero = self.backend.zero
+        for operation in self.operations:
+            kind = operation[0]
+            if kind == RecordingAugmentedMatrix.ADD:
+                _, coefficient, row_to_add, row_to_be_added_to = operation
+                rows[row_to_be_added_to] = [
+                    (coefficient * x + y) or zero for x, y in
+                    zip(rows[row_to_add], rows[row_to_be_added_to])]
+            elif kind == RecordingAugmentedMatrix.SCALE:
+                _, coefficient, row = operation
+                rows[row] = [(coefficient * x) or zero for x in rows[row]]
+            else:
+                _, row1, row2 = operation
+                rows[row1], rows[row2] = rows[row2], rows[row1]
+
+    def _parametrize(self, constant_terms):
+        basepoint_coords = [0] * self.dimension
+        for row, pivot_var in enumerate(self.pivot_indices):
+            if pivot_var < 0:
+                if not is_near_zero(constant_terms[row]):
+                    return LinearSystem.NO_SOLUTIONS_MSG
+            else:
+                basepoint_coords[pivot_var] = constant_terms[row]
+
+        basepoint_coords = self.rref.in_variable_order(basepoint_coords)
+        return Parametrization(Vector(basepoint_coords, self.backend),
+                               self.direction_vectors)
@@ -0,0 +1,259 @@
+"""Bulk loading of linear systems from files, and writing of their
+solutions.
+
+Systems are read as rows [a_1, ..., a_n, k] from CSV, NumPy .npy or
+binary files (the file format of MappedLinearSystem). The readers
+parse chunk_size rows at a time into one flat buffer per chunk, which
+is then copied straight into the rows of an AugmentedMatrix or a
+MappedLinearSystem; no Vector or Plane is built per row."""
+import ast
+import csv
+import struct
+import sys
+from array import array
+from decimal import getcontext
+
+from vector import Vector
+from backend import get_backend
+from linsys import LinearSystem, Parametrization
+from mapped import MappedLinearSystem
+from matrix import AugmentedMatrix
+
+getcontext().prec = 30
+
+CHUNK_SIZE = 4096
+
+NPY_MAGIC = b'\x93NUMPY'
+# .npy dtypes that can be read into an array, by their type code
+NPY_TYPECODES = {'f8': 'd', 'f4': 'f', 'i8': 'q', 'i4': 'i'}
+PARAMETRIZATION_MAGIC = b'LSYSPAR1'
+PARAMETRIZATION_HEADER_FORMAT = '<8sqq'
+
+UNKNOWN_FORMAT_MSG = 'Unknown file format: {}'
+ROW_LENGTH_MISMATCH_MSG = 'Row {} has {} entries instead of {}'
+UNSUPPORTED_NPY_MSG = 'Unsupported .npy file: {}'
+NOT_A_PARAMETRIZATION_FILE_MSG = 'Not a parametrization file: {}'
+
+
+def read_csv_chunks(path, backend='float', chunk_size=CHUNK_SIZE,
+                    delimiter=','):
+    """Yields (entries, width) for every chunk_size rows of a CSV file,
+    entries being the chunk's rows concatenated: an array('d') for the
+    float backend, a list of backend numbers otherwise. Blank lines are
+    skipped."""
+    backend = get_backend(backend)
+    convert = backend.convert
+    new_chunk = (lambda: array('d')) if backend.name == 'float' else list
+    width = None
+    with open(path, newline='') as f:
+        entries, count = new_chunk(), 0
+        for line_number, fields in enumerate(
+                csv.reader(f, delimiter=delimiter), 1):
+            if not fields:
+                continue
+            if width is None:
+                width = len(fields)
+            elif len(fields) != width:
+                raise Exception(ROW_LENGTH_MISMATCH_MSG.format(
+                    line_number, len(fields), width))
+            entries.extend(map(convert, fields))
+            count += 1
+            if count == chunk_size:
+                yield entries, width
+                entries, count = new_chunk(), 0
+        if count:
+            yield entries, width
+
+
+def read_npy_header(f):
+    """Reads the header of a .npy file and returns (typecode,
+    byteorder, shape); only C-ordered 2-D arrays of NPY_TYPECODES are
+    supported"""
+    if f.read(len(NPY_MAGIC)) != NPY_MAGIC:
+        raise Exception(UNSUPPORTED_NPY_MSG.format('bad magic string'))
+    major = f.read(2)[0]
+    size_format = '<H' if major == 1 else '<I'
+    header_size, = struct.unpack(size_format,
+                                 f.read(struct.calcsize(size_format)))
+    header = ast.literal_eval(f.read(header_size).decode('latin1'))
+    descr, shape = header['descr'], header['shape']
+    if (header['fortran_order'] or len(shape) != 2 or
+            descr[1:] not in NPY_TYPECODES):
+        raise Exception(UNSUPPORTED_NPY_MSG.format(header))
+    byteorder = {'<': 'little', '>': 'big'}.get(descr[0], sys.byteorder)
+    return NPY_TYPECODES[descr[1:]], byteorder, shape
+
+
+def read_npy_chunks(path, backend='float', chunk_size=CHUNK_SIZE):
+    """Yields (entries, width) for every chunk_size rows of a 2-D .npy
+    array, like read_csv_chunks"""
+    backend = get_backend(backend)
+    with open(path, 'rb') as f:
+        typecode, byteorder, (num_rows, width) = read_npy_header(f)
+        for start in range(0, num_rows, chunk_size):
+            entries = array(typecode)
+            entries.fromfile(f, min(chunk_size, num_rows - start) * width)
+            if byteorder != sys.byteorder:
+                entries.byteswap()
+            if backend.name != 'float':
+                entries = [backend.convert(x) for x in entries]
+            elif typecode != 'd':
+                entries = array('d', entries)
+            yield entries, width
+
+
+def read_binary_chunks(path, backend='float', chunk_size=CHUNK_SIZE):
+    """Yields (entries, width) for every chunk_size rows of a
+    MappedLinearSystem file, in its current row order"""
+    backend = get_backend(backend)
+    with MappedLinearSystem(path) as system:
+        width = system.dimension + 1
+        for start in range(0, len(system), chunk_size):
+            entries = system.read_rows(start, start + chunk_size)
+            if backend.name != 'float':
+                entries = [backend.convert(x) for x in entries]
+            yield entries, width
+
+
+READERS = {
+    'csv': read_csv_chunks,
+    'npy': read_npy_chunks,
+    'binary': read_binary_chunks,
+}
+
+
+def file_format(path):
+    """Guesses the format from the extension: .csv and .txt files are
+    CSV, .npy files NumPy arrays, anything else binary"""
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension in ('csv', 'txt'):
+        return 'csv'
+    if extension == 'npy':
+        return 'npy'
+    return 'binary'
+
+
+def iter_rows(path, format=None, backend='float', chunk_size=CHUNK_SIZE):
+    """Yields (row, width) for every row of the file, the row being a
+    slice of the chunk it was read in"""
+    try:
+        reader = READERS[format or file_format(path)]
+    except KeyError:
+        raise ValueError(UNKNOWN_FORMAT_MSG.format(format))
+    for entries, width in reader(path, backend, chunk_size):
+        for start in range(0, len(entries), width):
+            yield entries[start:start + width], width
+
+
+def load_matrix(path, format=None, backend='float', chunk_size=CHUNK_SIZE,
+                matrix_class=AugmentedMatrix):
+    """Reads the rows of a file into an AugmentedMatrix (or another
+    matrix_class taking (rows, dimension, backend))"""
+    rows = []
+    width = 1
+    for row, width in iter_rows(path, format, backend, chunk_size):
+        rows.append(row.tolist() if isinstance(row, array) else row)
+    return matrix_class(rows, width - 1, backend)
+
+
+def load_system(path, format=None, backend='float', chunk_size=CHUNK_SIZE,
+                matrix_class=AugmentedMatrix):
+    """Reads a file into a LinearSystem backed by its matrix; the
+    planes are only built if they are accessed"""
+    return LinearSystem.from_matrix(
+        load_matrix(path, format, backend, chunk_size, matrix_class))
+
+
+def load_mapped(path, mapped_path, format=None, chunk_size=CHUNK_SIZE):
+    """Streams a CSV or .npy file into a new MappedLinearSystem file at
+    mapped_path, holding only one chunk in memory"""
+    rows = iter_rows(path, format, 'float', chunk_size)
+    first = next(rows, None)
+    if first is None:
+        return MappedLinearSystem.create(mapped_path, [], 0)
+
+    def all_rows():
+        yield first[0]
+        for row, _ in rows:
+            yield row
+    return MappedLinearSystem.create(mapped_path, all_rows(), first[1] - 1)
+
+
+def _parametrization_rows(parametrization):
+    """The basepoint followed by the direction vectors"""
+    return ([parametrization.basepoint.coordinates] +
+            [v.coordinates for v in parametrization.direction_vectors])
+
+
+def write_parametrization_csv(path, parametrization, delimiter=','):
+    """Writes the basepoint, then one direction vector per line. The
+    numbers are written with str(), so Decimal and Fraction solutions
+    keep their precision."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        for coordinates in _parametrization_rows(parametrization):
+            writer.writerow([str(x) for x in coordinates])
+
+
+def write_parametrization_npy(path, parametrization):
+    """Writes the basepoint and the direction vectors as the rows of a
+    float64 .npy array"""
+    rows = _parametrization_rows(parametrization)
+    header = "{{'descr': '<f8', 'fortran_order': False, 'shape': ({}, {}), }}"
+    header = header.format(len(rows), parametrization.dimension)
+    # The header is padded so that the data starts on a 64 byte boundary
+    padding = -(len(NPY_MAGIC) + 4 + len(header) + 1) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    with open(path, 'wb') as f:
+        f.write(NPY_MAGIC + b'\x01\x00' + struct.pack('<H', len(header)))
+        f.write(header)
+        _write_little_endian_floats(f, rows)
+
+
+def write_parametrization_binary(path, parametrization):
+    """Writes a header (PARAMETRIZATION_MAGIC, number of vectors,
+    dimension) followed by the basepoint and the direction vectors as
+    little endian float64"""
+    rows = _parametrization_rows(parametrization)
+    with open(path, 'wb') as f:
+        f.write(struct.pack(PARAMETRIZATION_HEADER_FORMAT,
+                            PARAMETRIZATION_MAGIC, len(rows),
+                            parametrization.dimension))
+        _write_little_endian_floats(f, rows)
+
+
+def _write_little_endian_floats(f, rows):
+    for coordinates in rows:
+        values = array('d', map(float, coordinates))
+        if sys.byteorder != 'little':
+            values.byteswap()
+        values.tofile(f)
+
+
+def load_parametrization(path, format=None, backend='float'):
+    """Reads back a Parametrization written by one of the writers
+    above, in the format guessed from the extension"""
+    format = format or file_format(path)
+    if format == 'binary':
+        rows = _read_parametrization_binary(path)
+    else:
+        rows = [row for row, _ in iter_rows(path, format, backend)]
+    vectors = [Vector(row, backend) for row in rows]
+    return Parametrization(vectors[0], vectors[1:])
+
+
+def _read_parametrization_binary(path):
+    with open(path, 'rb') as f:
+        header = f.read(struct.calcsize(PARAMETRIZATION_HEADER_FORMAT))
+        try:
+            magic, num_vectors, dimension = struct.unpack(
+                PARAMETRIZATION_HEADER_FORMAT, header)
+        except struct.error:
+            magic = None
+        if magic != PARAMETRIZATION_MAGIC:
+            raise Exception(NOT_A_PARAMETRIZATION_FILE_MSG.format(path))
+        values = array('d')
+        values.fromfile(f, num_vectors * dimension)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return [values[i:i + dimension] for i in range(0, len(values), dimension)]
@@ -0,0 +1,379 @@
+"""Linear systems stored in a memory-mapped file, for systems that do
+not fit in memory"""
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from decimal import getcontext
+
+from vector import Vector
+from backend import is_near_zero
+from linsys import LinearSystem, Parametrization
+
+getcontext().prec = 30
+
+
+class MappedLinearSystem(object):
+    """A float64 augmented matrix [a_1, ..., a_n, k] kept in a file and
+    accessed through mmap, so only the rows being worked on need to be
+    in memory.
+
+    The file holds a header, the rows in the order they were written,
+    then the row order (row swaps only exchange two entries of it) and
+    the pivot column of every row. compute_rref eliminates in place,
+    updating the rows below (or above) each pivot in panels of
+    panel_rows rows, and saves its progress in the header after every
+    panel. A system whose elimination was interrupted can be opened
+    again and compute_rref carries on from the last saved panel; the
+    row swaps are journaled in the header, and redoing the rest of a
+    panel only cancels rounding errors again.
+
+    With the same pivoting, an uninterrupted elimination gives exactly
+    the solutions of the in-memory float elimination."""
+    MAGIC = b'LSYSMAP1'
+    # magic, num_equations, dimension, pivoting, phase, row, col,
+    # target, pending swap (row1, row2, new order of row1, of row2)
+    HEADER_FORMAT = '<8s11q'
+    HEADER_SIZE = 128
+    PIVOTING_STRATEGIES = ('first', 'partial')
+    NOT_STARTED, FORWARD, BACKWARD, DONE = range(4)
+
+    NOT_A_MAPPED_SYSTEM_MSG = 'Not a mapped linear system file: {}'
+    ROW_LENGTH_MISMATCH_MSG = ('Every row must hold {} coefficients and '
+                               'a constant term')
+    UNKNOWN_PIVOTING_MSG = 'Unknown pivoting strategy: {}'
+    PIVOTING_MISMATCH_MSG = ("The elimination was started with '{}' "
+                             "pivoting")
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'r+b')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        except ValueError:
+            self._file.close()
+            raise Exception(self.NOT_A_MAPPED_SYSTEM_MSG.format(path))
+        if self._map[:len(self.MAGIC)] != self.MAGIC:
+            self.close()
+            raise Exception(self.NOT_A_MAPPED_SYSTEM_MSG.format(path))
+        self._read_header()
+
+        self._row_size = 8 * (self.dimension + 1)
+        self._order_offset = (self.HEADER_SIZE +
+                              self._row_size * self.num_equations)
+        self._pivots_offset = self._order_offset + 8 * self.num_equations
+
+    @classmethod
+    def create(cls, path, rows, dimension):
+        """Writes the rows [a_1, ..., a_n, k] to a new file at path and
+        opens it. rows can be any iterable, e.g. a generator reading a
+        larger file, and is consumed one row at a time."""
+        width = dimension + 1
+        num_equations = 0
+        with open(path, 'wb') as f:
+            f.write(bytes(cls.HEADER_SIZE))
+            for row in rows:
+                row = array('d', row)
+                if len(row) != width:
+                    raise Exception(
+                        cls.ROW_LENGTH_MISMATCH_MSG.format(dimension))
+                row.tofile(f)
+                num_equations += 1
+            array('q', range(num_equations)).tofile(f)
+            array('q', [-1] * num_equations).tofile(f)
+            f.seek(0)
+            f.write(struct.pack(cls.HEADER_FORMAT, cls.MAGIC, num_equations,
+                                dimension, -1, cls.NOT_STARTED, 0, 0, -1,
+                                -1, -1, -1, -1))
+        return cls(path)
+
+    @classmethod
+    def from_planes(cls, path, planes):
+        """Writes the given planes or hyperplanes to a new file"""
+        rows = (list(p.normal_vector.coordinates) + [p.constant_term]
+                for p in planes)
+        return cls.create(path, rows, planes[0].normal_vector.dimension)
+
+    def copy(self, path):
+        """Copies the file, with its progress, to path and opens it"""
+        self._map.flush()
+        shutil.copyfile(self.path, path)
+        return MappedLinearSystem(path)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.num_equations
+
+    def __getitem__(self, i):
+        """Returns the i-th row [a_1, ..., a_n, k] in the current order"""
+        return self._read_row(i).tolist()
+
+    def __str__(self):
+        return 'Mapped Linear System: {} equations, {} variables ({})'.format(
+            self.num_equations, self.dimension, self.path)
+
+    def read_rows(self, start, stop):
+        """Returns rows start to stop (in the current order) as one flat
+        array('d') of (stop - start) * (dimension + 1) entries"""
+        data = array('d')
+        for position in range(start, min(stop, self.num_equations)):
+            data.extend(self._read_row(position))
+        return data
+
+    def _row_offset(self, position):
+        return (self.HEADER_SIZE +
+                self._row_size * self._read_index(self._order_offset,
+                                                  position))
+
+    def _read_row(self, position):
+        """Returns a copy of the row, as an array('d')"""
+        start = self._row_offset(position)
+        row = array('d')
+        row.frombytes(self._map[start:start + self._row_size])
+        return row
+
+    def _write_row(self, position, row):
+        start = self._row_offset(position)
+        self._map[start:start + self._row_size] = row.tobytes()
+
+    def _read_entry(self, position, col):
+        return struct.unpack_from('<d', self._map,
+                                  self._row_offset(position) + 8 * col)[0]
+
+    def _read_index(self, offset, i):
+        return struct.unpack_from('<q', self._map, offset + 8 * i)[0]
+
+    def _write_index(self, offset, i, value):
+        struct.pack_into('<q', self._map, offset + 8 * i, value)
+
+    def _read_header(self):
+        (_, self.num_equations, self.dimension, pivoting, self.phase,
+         self._pivot_row, self._pivot_col, self._target,
+         self._swap_row1, self._swap_row2, self._swap_order1,
+         self._swap_order2) = struct.unpack_from(self.HEADER_FORMAT,
+                                                 self._map)
+        self.pivoting = (None if pivoting < 0
+                         else self.PIVOTING_STRATEGIES[pivoting])
+
+    def _save_progress(self):
+        """Writes the progress to the header once the rows it refers to
+        are on disk"""
+        self._map.flush()
+        pivoting = (-1 if self.pivoting is None
+                    else self.PIVOTING_STRATEGIES.index(self.pivoting))
+        struct.pack_into(self.HEADER_FORMAT, self._map, 0, self.MAGIC,
+                         self.num_equations, self.dimension, pivoting,
+                         self.phase, self._pivot_row, self._pivot_col,
+                         self._target, self._swap_row1, self._swap_row2,
+                         self._swap_order1, self._swap_order2)
+        self._map.flush(0, min(mmap.PAGESIZE, len(self._map)))
+
+    def is_reduced(self):
+        return self.phase == self.DONE
+
+    def pivot_indices(self):
+        """Returns the pivot column of every row or -1 (all -1 before
+        the elimination)"""
+        return [self._read_index(self._pivots_offset, row)
+                for row in range(self.num_equations)]
+
+    def rank(self, pivoting='first', panel_rows=1024):
+        """Returns the rank. Unless the system is already reduced, the
+        elimination runs on a temporary copy of the file (next to it),
+        so the stored equations are left unchanged"""
+        if self.is_reduced():
+            return sum(1 for col in self.pivot_indices() if col >= 0)
+        with tempfile.TemporaryDirectory(
+                dir=os.path.dirname(os.path.abspath(self.path))) as directory:
+            with self.copy(os.path.join(directory, 'rank')) as system:
+                return system.compute_rref(pivoting, panel_rows).rank()
+
+    def nullity(self, pivoting='first', panel_rows=1024):
+        """Returns the nullity, leaving the stored equations unchanged
+        as rank() does"""
+        return self.dimension - self.rank(pivoting, panel_rows)
+
+    def compute_rref(self, pivoting='first', panel_rows=1024):
+        """Brings the file to reduced row echelon form in place,
+        resuming an interrupted elimination. pivoting is 'first' or
+        'partial', as for AugmentedMatrix, and must match the one the
+        elimination was started with."""
+        if pivoting not in self.PIVOTING_STRATEGIES:
+            raise ValueError(self.UNKNOWN_PIVOTING_MSG.format(pivoting))
+        if self.phase == self.NOT_STARTED:
+            self.pivoting = pivoting
+            self.phase = self.FORWARD
+            self._save_progress()
+        elif pivoting != self.pivoting:
+            raise Exception(self.PIVOTING_MISMATCH_MSG.format(self.pivoting))
+
+        if self._swap_row1 >= 0:
+            self._finish_swap()
+        if self.phase == self.FORWARD:
+            self._forward_elimination(panel_rows)
+        if self.phase == self.BACKWARD:
+            self._backward_elimination(panel_rows)
+        return self
+
+    def _choose_pivot_row(self, row, col):
+        num_equations = self.num_equations
+        if self.pivoting == 'first':
+            return next((row2 for row2 in range(row, num_equations)
+                         if not is_near_zero(self._read_entry(row2, col))),
+                        None)
+        best = max(range(row, num_equations),
+                   key=lambda row2: abs(self._read_entry(row2, col)))
+        return None if is_near_zero(self._read_entry(best, col)) else best
+
+    def _start_swap(self, row, pivot_row):
+        """Journals the new order of both rows before changing it, so
+        that an interrupted swap is redone rather than undone"""
+        offset = self._order_offset
+        self._swap_row1, self._swap_row2 = row, pivot_row
+        self._swap_order1 = self._read_index(offset, pivot_row)
+        self._swap_order2 = self._read_index(offset, row)
+        self._save_progress()
+        self._finish_swap()
+
+    def _finish_swap(self):
+        self._write_index(self._order_offset, self._swap_row1,
+                          self._swap_order1)
+        self._write_index(self._order_offset, self._swap_row2,
+                          self._swap_order2)
+        self._write_index(self._pivots_offset, self._pivot_row,
+                          self._pivot_col)
+        self._swap_row1 = self._swap_row2 = -1
+        self._swap_order1 = self._swap_order2 = -1
+        self._target = self._pivot_row + 1
+        self._save_progress()
+
+    def _forward_elimination(self, panel_rows):
+        num_equations = self.num_equations
+        while (self._pivot_row < num_equations and
+               self._pivot_col < self.dimension):
+            row, col = self._pivot_row, self._pivot_col
+            if self._target < 0:
+                pivot_row = self._choose_pivot_row(row, col)
+                if pivot_row is None:
+                    self._pivot_col += 1
+                    self._save_progress()
+                    continue
+                self._start_swap(row, pivot_row)
+
+            source = self._read_row(row)
+            while self._target < num_equations:
+                stop = min(self._target + panel_rows, num_equations)
+                for target in range(self._target, stop):
+                    self._add_multiple_of_row(source, col, source[col],
+                                              target)
+                self._target = stop
+                self._save_progress()
+
+            self._pivot_row += 1
+            self._pivot_col += 1
+            self._target = -1
+            self._save_progress()
+
+        self.phase = self.BACKWARD
+        self._pivot_row = num_equations - 1
+        self._target = -1
+        self._save_progress()
+
+    def _add_multiple_of_row(self, source, col, pivot, target):
+        """Adds the multiple of the source row that cancels column col
+        of the target row, pivot being taken as the source's entry in
+        that column. Repeating it after an interruption only cancels the
+        rounding error left in column col."""
+        row = self._read_row(target)
+        coefficient = -row[col] / pivot
+        if not coefficient:
+            return
+        row = array('d', [coefficient * x + y for x, y in zip(source, row)])
+        if not row[-1]:
+            row[-1] = 0.0
+        self._write_row(target, row)
+
+    def _backward_elimination(self, panel_rows):
+        while self._pivot_row >= 0:
+            row = self._pivot_row
+            col = self._read_index(self._pivots_offset, row)
+            if col < 0:
+                self._pivot_row -= 1
+                continue
+            if self._target < 0:
+                # Repeating the scaling multiplies the row by about 1
+                pivot = self._read_row(row)
+                coefficient = 1.0 / pivot[col]
+                pivot = array('d', [coefficient * x for x in pivot])
+                if not pivot[-1]:
+                    pivot[-1] = 0.0
+                self._write_row(row, pivot)
+                self._target = row - 1
+                self._save_progress()
+
+            source = self._read_row(row)
+            while self._target >= 0:
+                stop = max(self._target - panel_rows, -1)
+                # The scaled pivot is taken as exactly 1
+                for target in range(self._target, stop, -1):
+                    self._add_multiple_of_row(source, col, 1.0, target)
+                self._target = stop
+                self._save_progress()
+
+            self._pivot_row -= 1
+            self._target = -1
+            self._save_progress()
+
+        self.phase = self.DONE
+        self._save_progress()
+
+    def has_contradictory_equation(self):
+        """Checks for a row of the form 0 = k with k non-zero, assuming
+        the system is reduced"""
+        for row, pivot_var in enumerate(self.pivot_indices()):
+            if pivot_var < 0 and not is_near_zero(
+                    self._read_entry(row, self.dimension)):
+                return True
+        return False
+
+    def compute_solution(self, pivoting='first', panel_rows=1024):
+        """Returns the Parametrization of the solutions, or
+        LinearSystem.NO_SOLUTIONS_MSG. The elimination runs in place on
+        the file; use copy() first to keep the original system."""
+        self.compute_rref(pivoting, panel_rows)
+        if self.has_contradictory_equation():
+            return LinearSystem.NO_SOLUTIONS_MSG
+
+        num_variables = self.dimension
+        pivot_indices = self.pivot_indices()
+        pivot_rows = [(row, pivot_var)
+                      for row, pivot_var in enumerate(pivot_indices)
+                      if pivot_var >= 0]
+        basepoint_coords = [0] * num_variables
+        for row, pivot_var in pivot_rows:
+            basepoint_coords[pivot_var] = self._read_entry(row,
+                                                           num_variables)
+
+        # Same order of the direction vectors as the in-memory path
+        free_variable_indices = set(range(num_variables)) - set(pivot_indices)
+        direction_vectors = []
+        for free_var in free_variable_indices:
+            vector_coords = [0] * num_variables
+            vector_coords[free_var] = 1
+            for row, pivot_var in pivot_rows:
+                vector_coords[pivot_var] = -self._read_entry(row, free_var)
+            direction_vectors.append(Vector(vector_coords, 'float'))
+
+        return Parametrization(Vector(basepoint_coords, 'float'),
+                               direction_vectors)
@@ -0,0 +1,564 @@
+"""Dense augmented matrix used by LinearSystem to run Gaussian
+elimination in place"""
+from decimal import getcontext
+from fractions import Fraction
+from math import lcm
+
+from vector import Vector
+from hyperplane import Hyperplane
+from backend import get_backend, is_near_zero
+
+getcontext().prec = 30
+
+
+class AugmentedMatrix(object):
+    """Stores a system of equations as rows [a_1, ..., a_n, k] so that
+    row operations update plain lists instead of rebuilding planes.
+    The entries are numbers of the given backend.
+
+    Complete pivoting reorders the columns; column_order[j] is then the
+    variable stored in column j (None means the identity order).
+
+    The elimination records pivot_columns, the pivot column of every
+    row or -1 (None until the matrix has been eliminated), from which
+    rank, nullity and the free variables are read without rescanning
+    the coefficients.
+
+    to_planes() materializes the rows as plane_class objects: the class
+    of the planes the matrix was built from, or Hyperplane"""
+    FIRST_NONZERO_PIVOTING = 'first'
+    PARTIAL_PIVOTING = 'partial'
+    SCALED_PIVOTING = 'scaled'
+    COMPLETE_PIVOTING = 'complete'
+    PIVOTING_STRATEGIES = (FIRST_NONZERO_PIVOTING, PARTIAL_PIVOTING,
+                           SCALED_PIVOTING, COMPLETE_PIVOTING)
+    UNKNOWN_PIVOTING_MSG = 'Unknown pivoting strategy: {}'
+
+    def __init__(self, rows, dimension, backend=None):
+        self.rows = rows
+        self.dimension = dimension
+        self.backend = get_backend(backend)
+        self.column_order = None
+        self.pivot_columns = None
+        self.plane_class = Hyperplane
+
+    @classmethod
+    def from_planes(cls, planes):
+        """Builds the augmented matrix of the given planes"""
+        dimension = planes[0].dimension
+        rows = [list(p.normal_vector.coordinates) + [p.constant_term]
+                for p in planes]
+        matrix = cls(rows, dimension, planes[0].normal_vector.backend)
+        matrix.plane_class = type(planes[0])
+        return matrix
+
+    def copy(self, matrix_class=None):
+        """Returns a copy with its own rows, optionally as another
+        AugmentedMatrix class"""
+        matrix = (matrix_class or type(self))(
+            [list(row) for row in self.rows], self.dimension, self.backend)
+        matrix.plane_class = self.plane_class
+        if self.column_order is not None:
+            matrix.column_order = list(self.column_order)
+        if self.pivot_columns is not None:
+            matrix.pivot_columns = list(self.pivot_columns)
+        return matrix
+
+    def to_planes(self):
+        """Materializes every row as a plane_class object, with the
+        coefficients back in the original variable order"""
+        backend = self.backend
+        plane_class = self.plane_class
+        return [plane_class(normal_vector=Vector(
+                    self.in_variable_order(row[:-1]), backend),
+                    constant_term=row[-1])
+                for row in self.rows]
+
+    def in_variable_order(self, coordinates):
+        """Maps per-column coordinates back to the original variable
+        order when complete pivoting has reordered the columns"""
+        if self.column_order is None:
+            return coordinates
+        ordered = [0] * self.dimension
+        for col, var in enumerate(self.column_order):
+            ordered[var] = coordinates[col]
+        return ordered
+
+    def swap_columns(self, col1, col2):
+        if self.column_order is None:
+            self.column_order = list(range(self.dimension))
+        order = self.column_order
+        order[col1], order[col2] = order[col2], order[col1]
+        for row in self.rows:
+            row[col1], row[col2] = row[col2], row[col1]
+
+    def swap_rows(self, row1, row2):
+        rows = self.rows
+        rows[row1], rows[row2] = rows[row2], rows[row1]
+
+    def multiply_coefficient_and_row(self, coefficient, row):
+        target = self.rows[row]
+        target[:] = [coefficient * x for x in target]
+        if not target[-1]:
+            target[-1] = self.backend.zero
+
+    def add_multiple_times_row_to_row(self, coefficient, row_to_add,
+                                      row_to_be_added_to):
+        source = self.rows[row_to_add]
+        target = self.rows[row_to_be_added_to]
+        target[:] = [coefficient * x + y for x, y in zip(source, target)]
+        if not target[-1]:
+            target[-1] = self.backend.zero
+
+    def first_nonzero_index(self, row):
+        """Returns the column of the first non-zero coefficient
+        of the row, or -1 when all coefficients are zero"""
+        coefficients = self.rows[row]
+        for k in range(self.dimension):
+            if not is_near_zero(coefficients[k]):
+                return k
+        return -1
+
+    def indices_of_first_nonzero_terms_in_each_row(self):
+        return [self.first_nonzero_index(row) for row in range(len(self))]
+
+    def pivot_indices(self):
+        """Returns the pivot column of every row or -1, from the
+        elimination's record when available"""
+        if self.pivot_columns is not None:
+            return self.pivot_columns
+        return self.indices_of_first_nonzero_terms_in_each_row()
+
+    def pivot_variables(self):
+        """Returns the pivot variable of every row or -1, in the
+        original variable order"""
+        pivot_indices = self.pivot_indices()
+        if self.column_order is None:
+            return list(pivot_indices)
+        return [self.column_order[col] if col >= 0 else -1
+                for col in pivot_indices]
+
+    def free_variables(self):
+        """Returns the sorted indices of the non-pivot variables"""
+        return sorted(set(range(self.dimension)) -
+                      set(self.pivot_variables()))
+
+    def rank(self):
+        return sum(1 for col in self.pivot_indices() if col >= 0)
+
+    def nullity(self):
+        return self.dimension - self.rank()
+
+    def compute_triangular_form(self, pivoting=FIRST_NONZERO_PIVOTING):
+        """Brings the matrix to triangular form in place, choosing the
+        pivots with one of PIVOTING_STRATEGIES:
+        'first' takes the first row with a non-zero entry,
+        'partial' the largest entry of the column,
+        'scaled' the largest entry relative to the rest of its row,
+        'complete' the largest entry of the remaining submatrix"""
+        choose_pivot_row = self._pivot_chooser(pivoting)
+        rows = self.rows
+        num_equations = len(rows)
+        pivot_columns = [-1] * num_equations
+        col = 0
+        for row in range(num_equations):
+            while col < self.dimension:
+                pivot_row = choose_pivot_row(row, col)
+                if pivot_row is None:
+                    col += 1
+                    continue
+                if pivot_row != row:
+                    self.swap_rows(row, pivot_row)
+                for row2 in range(row + 1, num_equations):
+                    coefficient = -rows[row2][col] / rows[row][col]
+                    self.add_multiple_times_row_to_row(coefficient, row, row2)
+                pivot_columns[row] = col
+                col += 1
+                break
+        self.pivot_columns = pivot_columns
+        return self
+
+    def _pivot_chooser(self, pivoting):
+        """Returns a function (row, col) -> the row holding the pivot
+        for column col, or None if the column has no usable pivot"""
+        rows = self.rows
+        num_equations = len(rows)
+
+        def first_nonzero(row, col):
+            if not is_near_zero(rows[row][col]):
+                return row
+            return next((row2 for row2 in range(row + 1, num_equations)
+                         if not is_near_zero(rows[row2][col])), None)
+
+        def partial(row, col):
+            best = max(range(row, num_equations),
+                       key=lambda row2: abs(rows[row2][col]))
+            return None if is_near_zero(rows[best][col]) else best
+
+        # Scale factors are taken from the initial rows; they are keyed
+        # by row object since the rows are updated in place and swapped
+        scales = {}
+        if pivoting == self.SCALED_PIVOTING:
+            scales = {id(r): max(abs(x) for x in r[:self.dimension])
+                      for r in rows}
+
+        def scaled(row, col):
+            candidates = [row2 for row2 in range(row, num_equations)
+                          if not is_near_zero(rows[row2][col])]
+            if not candidates:
+                return None
+            return max(candidates,
+                       key=lambda row2: abs(rows[row2][col]) /
+                       scales[id(rows[row2])])
+
+        def complete(row, col):
+            best_row, best_col, best = None, None, None
+            for row2 in range(row, num_equations):
+                r = rows[row2]
+                for col2 in range(col, self.dimension):
+                    if best is None or abs(r[col2]) > best:
+                        best_row, best_col, best = row2, col2, abs(r[col2])
+            if is_near_zero(best):
+                return None
+            if best_col != col:
+                self.swap_columns(col, best_col)
+            return best_row
+
+        choosers = {
+            self.FIRST_NONZERO_PIVOTING: first_nonzero,
+            self.PARTIAL_PIVOTING: partial,
+            self.SCALED_PIVOTING: scaled,
+            self.COMPLETE_PIVOTING: complete,
+        }
+        try:
+            return choosers[pivoting]
+        except KeyError:
+            raise ValueError(self.UNKNOWN_PIVOTING_MSG.format(pivoting))
+
+    def compute_rref(self, pivoting=FIRST_NONZERO_PIVOTING):
+        """Brings the matrix to reduced row echelon form in place"""
+        self.compute_triangular_form(pivoting)
+        pivot_indices = self.pivot_columns
+
+        for row in range(len(self))[::-1]:
+            pivot_var = pivot_indices[row]
+            if pivot_var < 0:
+                continue
+            self.scale_row_to_make_coefficient_equal_one(row, pivot_var)
+            self.clear_coefficients_above(row, pivot_var)
+
+        return self
+
+    def scale_row_to_make_coefficient_equal_one(self, row, col):
+        coefficient = self.backend.one / self.rows[row][col]
+        self.multiply_coefficient_and_row(coefficient, row)
+
+    def clear_coefficients_above(self, row, col):
+        rows = self.rows
+        for k in range(row)[::-1]:
+            alpha = -rows[k][col]
+            self.add_multiple_times_row_to_row(alpha, row, k)
+
+    def has_contradictory_equation(self):
+        """Checks for a row of the form 0 = k with k non-zero"""
+        for row, pivot_var in enumerate(self.pivot_indices()):
+            if pivot_var < 0 and not is_near_zero(self.rows[row][-1]):
+                return True
+        return False
+
+    def extract_direction_vectors_for_parametrization(self):
+        """Returns the coordinates of one direction vector per free
+        variable, assuming the matrix is in rref"""
+        num_variables = self.dimension
+        pivot_indices = self.pivot_indices()
+        free_variable_indices = set(range(num_variables)) - set(pivot_indices)
+        if self.column_order is not None:
+            free_variable_indices = sorted(
+                free_variable_indices, key=self.column_order.__getitem__)
+
+        direction_vectors = []
+        for free_var in free_variable_indices:
+            vector_coords = [0] * num_variables
+            vector_coords[free_var] = 1
+            for row, pivot_var in enumerate(pivot_indices):
+                if pivot_var < 0:
+                    break
+                vector_coords[pivot_var] = -self.rows[row][free_var]
+            direction_vectors.append(self.in_variable_order(vector_coords))
+
+        return direction_vectors
+
+    def extract_basepoint_for_parametrization(self):
+        """Returns the basepoint coordinates, assuming the matrix
+        is in rref"""
+        pivot_indices = self.pivot_indices()
+        basepoint_coords = [0] * self.dimension
+
+        for row, pivot_var in enumerate(pivot_indices):
+            if pivot_var < 0:
+                break
+            basepoint_coords[pivot_var] = self.rows[row][-1]
+
+        return self.in_variable_order(basepoint_coords)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class RecordingAugmentedMatrix(AugmentedMatrix):
+    """Augmented matrix that records its row operations, so that the
+    elimination can be replayed on other constant terms"""
+    SWAP = 0
+    SCALE = 1
+    ADD = 2
+
+    def __init__(self, rows, dimension, backend=None):
+        super(RecordingAugmentedMatrix, self).__init__(rows, dimension,
+                                                       backend)
+        self.operations = []
+
+    def swap_rows(self, row1, row2):
+        self.operations.append((self.SWAP, row1, row2))
+        super(RecordingAugmentedMatrix, self).swap_rows(row1, row2)
+
+    def multiply_coefficient_and_row(self, coefficient, row):
+        self.operations.append((self.SCALE, coefficient, row))
+        super(RecordingAugmentedMatrix, self).multiply_coefficient_and_row(
+            coefficient, row)
+
+    def add_multiple_times_row_to_row(self, coefficient, row_to_add,
+                                      row_to_be_added_to):
+        self.operations.append((self.ADD, coefficient, row_to_add,
+                                row_to_be_added_to))
+        super(RecordingAugmentedMatrix, self).add_multiple_times_row_to_row(
+            coefficient, row_to_add, row_to_be_added_to)
+
+
+class BlockedAugmentedMatrix(AugmentedMatrix):
+    """Float augmented matrix whose eliminations are computed panel by
+    panel, for large dense systems.
+
+    The pivots of block_size consecutive columns are found first,
+    updating only the panel's columns. The remaining columns of every
+    row are then updated once per panel, and the back substitution
+    updates every row once from all the pivot rows below it. These
+    updates add four pivot rows per pass over the row, in the order of
+    the row operations, so that the triangular form rounds exactly as
+    AugmentedMatrix's while running about twice as fast."""
+    BLOCKED_PIVOTING_STRATEGIES = ('first', 'partial')
+    ONLY_FLOAT_BACKEND_MSG = 'Blocked matrices only support the float ' \
+                             'backend, not {}'
+
+    def __init__(self, rows, dimension, backend='float', block_size=64):
+        backend = get_backend(backend)
+        if backend.name != 'float':
+            raise ValueError(self.ONLY_FLOAT_BACKEND_MSG.format(
+                backend.name))
+        super(BlockedAugmentedMatrix, self).__init__(
+            [[float(x) for x in row] for row in rows], dimension, backend)
+        self.block_size = block_size
+
+    def copy(self, matrix_class=None):
+        matrix = super(BlockedAugmentedMatrix, self).copy(matrix_class)
+        if isinstance(matrix, BlockedAugmentedMatrix):
+            matrix.block_size = self.block_size
+        return matrix
+
+    def multiply_coefficient_and_row(self, coefficient, row):
+        target = self.rows[row]
+        target[:] = [coefficient * x for x in target]
+
+    def add_multiple_times_row_to_row(self, coefficient, row_to_add,
+                                      row_to_be_added_to):
+        source = self.rows[row_to_add]
+        target = self.rows[row_to_be_added_to]
+        target[:] = [coefficient * x + y for x, y in zip(source, target)]
+
+    def compute_triangular_form(self, pivoting='partial'):
+        """Blocked triangular form with 'partial' (default) or 'first'
+        pivoting"""
+        if pivoting not in self.BLOCKED_PIVOTING_STRATEGIES:
+            raise ValueError(self.UNKNOWN_PIVOTING_MSG.format(pivoting))
+        rows = self.rows
+        num_equations = len(rows)
+        pivot_columns = [-1] * num_equations
+        row = 0
+        panel_start = 0
+        while panel_start < self.dimension and row < num_equations:
+            panel_end = min(panel_start + self.block_size, self.dimension)
+            first_pivot_row = row
+            # multipliers[r][k]: coefficient of the k-th panel pivot row
+            # still to be added to the trailing columns of row r
+            multipliers = [[] for _ in range(num_equations)]
+            for col in range(panel_start, panel_end):
+                if row >= num_equations:
+                    break
+                pivot_row = self._panel_pivot_row(row, col, pivoting)
+                if pivot_row is None:
+                    continue
+                if pivot_row != row:
+                    self.swap_rows(row, pivot_row)
+                    multipliers[row], multipliers[pivot_row] = (
+                        multipliers[pivot_row], multipliers[row])
+                source = rows[row]
+                pivot_value = source[col]
+                panel_source = source[col:panel_end]
+                for row2 in range(row + 1, num_equations):
+                    target = rows[row2]
+                    coefficient = -target[col] / pivot_value
+                    multipliers[row2].append(coefficient)
+                    if coefficient:
+                        target[col:panel_end] = [
+                            coefficient * x + y for x, y in
+                            zip(panel_source, target[col:panel_end])]
+                pivot_columns[row] = col
+                row += 1
+
+            self._update_trailing_columns(first_pivot_row, row, panel_end,
+                                          multipliers)
+            panel_start = panel_end
+        self.pivot_columns = pivot_columns
+        return self
+
+    def compute_rref(self, pivoting='partial'):
+        """Blocked reduced row echelon form: every pivot row is reduced
+        by all the (already reduced) pivot rows below it at once, then
+        scaled to make its pivot one"""
+        self.compute_triangular_form(pivoting)
+        rows = self.rows
+        # (row, pivot column) of the reduced rows, from the bottom up
+        reduced = []
+        for row in range(len(rows))[::-1]:
+            col = self.pivot_columns[row]
+            if col < 0:
+                continue
+            target = rows[row]
+            tail = _add_row_multiples(
+                [-target[col2] for _, col2 in reduced],
+                [rows[row2][col:] for row2, _ in reduced], target[col:])
+            scale = 1.0 / tail[0]
+            target[:col] = [scale * x for x in target[:col]]
+            target[col:] = [scale * x for x in tail]
+            reduced.append((row, col))
+        return self
+
+    def _panel_pivot_row(self, row, col, pivoting):
+        rows = self.rows
+        if pivoting == 'first':
+            return next((row2 for row2 in range(row, len(rows))
+                         if not is_near_zero(rows[row2][col])), None)
+        best = max(range(row, len(rows)), key=lambda r: abs(rows[r][col]))
+        return None if is_near_zero(rows[best][col]) else best
+
+    def _update_trailing_columns(self, first_pivot_row, end_pivot_row,
+                                 panel_end, multipliers):
+        rows = self.rows
+        num_pivots = end_pivot_row - first_pivot_row
+        if not num_pivots:
+            return
+        # The pivot rows depend on each other, in order
+        sources = []
+        for row in range(first_pivot_row, len(rows)):
+            coefficients = multipliers[row][:row - first_pivot_row]
+            if any(coefficients):
+                rows[row][panel_end:] = _add_row_multiples(
+                    coefficients, sources, rows[row][panel_end:])
+            if row < end_pivot_row:
+                sources.append(rows[row][panel_end:])
+
+
+def _add_row_multiples(coefficients, sources, target):
+    """Returns target plus coefficients[k] * sources[k] for every k,
+    added in order so that the sums round as one row operation per
+    source would, four sources per pass over the row"""
+    terms = [(coefficient, source) for coefficient, source in
+             zip(coefficients, sources) if coefficient]
+    for k in range(0, len(terms) - 3, 4):
+        (c0, s0), (c1, s1), (c2, s2), (c3, s3) = terms[k:k + 4]
+        target = [c3 * w + (c2 * z + (c1 * y + (c0 * x + t)))
+                  for x, y, z, w, t in zip(s0, s1, s2, s3, target)]
+    for coefficient, source in terms[len(terms) - len(terms) % 4:]:
+        target = [coefficient * x + t for x, t in zip(source, target)]
+    return target
+
+
+class FractionFreeAugmentedMatrix(AugmentedMatrix):
+    """Exact augmented matrix: the entries are converted to Fractions
+    without rounding and the zero tests involve no tolerance.
+
+    The triangular form scales every row to integers and then runs
+    Bareiss' fraction-free elimination, in which every update
+    (pivot * y - factor * x) / previous pivot divides exactly. The
+    entries stay integers bounded by minors of the matrix, instead of
+    the growing fractions of a naive Fraction elimination. The rref
+    only divides by the pivots at the end.
+
+    The pivoting strategies compare the integer rows, so 'complete'
+    pivoting may pick other free variables than on the original rows."""
+
+    def __init__(self, rows, dimension, backend='fraction'):
+        super(FractionFreeAugmentedMatrix, self).__init__(
+            [[Fraction(x) for x in row] for row in rows], dimension,
+            'fraction')
+
+    def multiply_coefficient_and_row(self, coefficient, row):
+        target = self.rows[row]
+        target[:] = [coefficient * x for x in target]
+
+    def add_multiple_times_row_to_row(self, coefficient, row_to_add,
+                                      row_to_be_added_to):
+        source = self.rows[row_to_add]
+        target = self.rows[row_to_be_added_to]
+        target[:] = [coefficient * x + y for x, y in zip(source, target)]
+
+    def compute_triangular_form(self, pivoting=AugmentedMatrix.
+                                FIRST_NONZERO_PIVOTING):
+        """Fraction-free triangular form; the rows are left as integer
+        multiples of the rows of a usual triangular form"""
+        rows = self.rows
+        for row in rows:
+            multiplier = lcm(*[Fraction(x).denominator for x in row])
+            row[:] = [int(x * multiplier) for x in row]
+        # After the scaling, so that 'scaled' pivoting takes its scale
+        # factors from the integer rows it compares
+        choose_pivot_row = self._pivot_chooser(pivoting)
+
+        num_equations = len(rows)
+        pivot_columns = [-1] * num_equations
+        previous_pivot = 1
+        col = 0
+        for row in range(num_equations):
+            while col < self.dimension:
+                pivot_row = choose_pivot_row(row, col)
+                if pivot_row is None:
+                    col += 1
+                    continue
+                if pivot_row != row:
+                    self.swap_rows(row, pivot_row)
+                source = rows[row]
+                pivot = source[col]
+                for row2 in range(row + 1, num_equations):
+                    target = rows[row2]
+                    factor = target[col]
+                    target[:] = [(pivot * y - factor * x) // previous_pivot
+                                 for x, y in zip(source, target)]
+                previous_pivot = pivot
+                pivot_columns[row] = col
+                col += 1
+                break
+        self.pivot_columns = pivot_columns
+        return self
+
+    def compute_rref(self, pivoting=AugmentedMatrix.FIRST_NONZERO_PIVOTING):
+        """Exact reduced row echelon form, with Fraction entries"""
+        self.compute_triangular_form(pivoting)
+        rows = self.rows
+        for row in range(len(self))[::-1]:
+            col = self.pivot_columns[row]
+            if col < 0:
+                rows[row][:] = [Fraction(x) for x in rows[row]]
+                continue
+            pivot = rows[row][col]
+            rows[row][:] = [Fraction(x, pivot) for x in rows[row]]
+            self.clear_coefficients_above(row, col)
+        return self
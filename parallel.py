@@ -0,0 +1,157 @@
+"""Process-pool execution of batch solves and bulk vector operations.
+
+Work is sent to the workers in chunks of compact, picklable payloads
+(plain rows of numbers, array buffers) rather than as Vector or Plane
+objects, and the results always come back in input order."""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+
+from vector import Vector
+from vector_array import VectorArray
+from matrix import AugmentedMatrix
+from batch import BatchSolution, solve_batch
+from linsys import LinearSystem, Parametrization
+
+
+class ParallelExecutor(object):
+    """Runs work on a pool of worker processes. With workers=1 the
+    work runs in the calling process. Use it as a context manager, or
+    call close(), to shut the pool down."""
+    UNKNOWN_VECTOR_OPERATION_MSG = 'Unknown vector operation: {}'
+    VECTOR_OPERATIONS = ('dot', 'cross', 'angle_with',
+                         'component_parallel_to', 'component_orthogonal_to',
+                         'magnitude', 'normalized')
+
+    def __init__(self, workers=None, chunk_size=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _chunks(self, count):
+        """Returns the (start, stop) ranges the work is split into"""
+        chunk_size = self.chunk_size
+        if not chunk_size:
+            # A few chunks per worker balances uneven chunks
+            chunk_size = max(1, -(-count // (self.workers * 4)))
+        return [(start, min(start + chunk_size, count))
+                for start in range(0, count, chunk_size)]
+
+    def _map(self, function, payloads):
+        if self.workers == 1:
+            return list(map(function, payloads))
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return list(self._pool.map(function, payloads))
+
+    def solve_systems(self, systems, pivoting='first'):
+        """Returns compute_solution(pivoting) of every LinearSystem"""
+        payloads = []
+        for start, stop in self._chunks(len(systems)):
+            chunk = []
+            for system in systems[start:stop]:
+                matrix = system.to_augmented_matrix()
+                chunk.append((matrix.rows, matrix.dimension,
+                              matrix.backend.name, matrix.column_order))
+            payloads.append((chunk, pivoting))
+
+        solutions = []
+        for chunk_results in self._map(_solve_systems_chunk, payloads):
+            for result, backend in chunk_results:
+                if result is None:
+                    solutions.append(LinearSystem.NO_SOLUTIONS_MSG)
+                    continue
+                basepoint, direction_vectors = result
+                solutions.append(Parametrization(
+                    Vector(basepoint, backend),
+                    [Vector(v, backend) for v in direction_vectors]))
+        return solutions
+
+    def solve_batch(self, coefficients, constant_terms, backend='float'):
+        """Parallel version of batch.solve_batch"""
+        payloads = [(coefficients[start:stop], constant_terms[start:stop],
+                     backend)
+                    for start, stop in self._chunks(len(coefficients))]
+        statuses, basepoints, direction_vectors = [], [], []
+        for result in self._map(_solve_batch_chunk, payloads):
+            statuses.extend(result.statuses)
+            basepoints.extend(result.basepoints)
+            direction_vectors.extend(result.direction_vectors)
+        return BatchSolution(statuses, basepoints, direction_vectors)
+
+    def map_vector_operation(self, operation, vectors, others=None):
+        """Applies a VectorArray method row-wise, e.g.
+        map_vector_operation('dot', a, b). Returns an array('d') for
+        scalar results and a VectorArray for vector results."""
+        if operation not in self.VECTOR_OPERATIONS:
+            raise ValueError(
+                self.UNKNOWN_VECTOR_OPERATION_MSG.format(operation))
+        d = vectors.dimension
+        if others is not None and not isinstance(others, Vector):
+            others = vectors._broadcast(others)
+        payloads = []
+        for start, stop in self._chunks(len(vectors)):
+            other = others
+            if isinstance(others, VectorArray):
+                other = (others.data[start * d:stop * d], d)
+            payloads.append((operation, vectors.data[start * d:stop * d],
+                             d, other))
+
+        results = self._map(_vector_operation_chunk, payloads)
+        if not results:
+            return array('d')
+        if isinstance(results[0], array):
+            merged = array('d')
+            for result in results:
+                merged.extend(result)
+            return merged
+        data = array('d')
+        for result_data, dimension in results:
+            data.extend(result_data)
+        return VectorArray(data, results[0][1])
+
+
+def _solve_systems_chunk(payload):
+    chunk, pivoting = payload
+    results = []
+    for rows, dimension, backend, column_order in chunk:
+        matrix = AugmentedMatrix(rows, dimension, backend)
+        # The columns of a system eliminated with complete pivoting
+        # are stored in another order than the variables
+        matrix.column_order = column_order
+        rref = matrix.compute_rref(pivoting)
+        if rref.has_contradictory_equation():
+            results.append((None, backend))
+            continue
+        results.append(((rref.extract_basepoint_for_parametrization(),
+                         rref.extract_direction_vectors_for_parametrization()),
+                        backend))
+    return results
+
+
+def _solve_batch_chunk(payload):
+    coefficients, constant_terms, backend = payload
+    return solve_batch(coefficients, constant_terms, backend)
+
+
+def _vector_operation_chunk(payload):
+    operation, data, dimension, other = payload
+    vectors = VectorArray(data, dimension)
+    if isinstance(other, tuple):
+        other = VectorArray(*other)
+    method = getattr(vectors, operation)
+    result = method() if other is None else method(other)
+    if isinstance(result, VectorArray):
+        return result.data, result.dimension
+    return result
@@ -0,0 +1,203 @@
+"""Sparse linear systems, for equations with few non-zero coefficients"""
+from decimal import getcontext
+from heapq import heappop, heappush
+
+from vector import Vector
+from backend import get_backend, is_near_zero
+from linsys import LinearSystem, Parametrization
+
+getcontext().prec = 30
+
+
+class SparseLinearSystem(object):
+    """Stores every equation as a dict {variable index: coefficient}
+    holding only its non-zero coefficients, plus its constant term.
+
+    The elimination picks its pivots in a fill-reducing (Markowitz)
+    order: the row with the fewest non-zeros, and in it the column
+    shared by the fewest rows among the entries that are at least
+    pivot_threshold times the largest one of the row. Time and memory
+    then scale with the number of non-zeros instead of n^2."""
+    ROWS_AND_CONSTANT_TERMS_MISMATCH_MSG = (
+        'There must be one constant term per equation')
+    VARIABLE_OUT_OF_RANGE_MSG = 'Variable index {} is out of range'
+
+    def __init__(self, rows, constant_terms, dimension, backend=None):
+        if len(rows) != len(constant_terms):
+            raise Exception(self.ROWS_AND_CONSTANT_TERMS_MISMATCH_MSG)
+        self.backend = get_backend(backend)
+        self.dimension = dimension
+        convert = self.backend.convert
+        self.rows = []
+        for row in rows:
+            sparse_row = {}
+            for var, coefficient in row.items():
+                if not 0 <= var < dimension:
+                    raise IndexError(
+                        self.VARIABLE_OUT_OF_RANGE_MSG.format(var))
+                coefficient = convert(coefficient)
+                if not is_near_zero(coefficient):
+                    sparse_row[var] = coefficient
+            self.rows.append(sparse_row)
+        self.constant_terms = [convert(k) for k in constant_terms]
+        self.pivot_indices = None
+
+    @classmethod
+    def from_planes(cls, planes):
+        """Builds the sparse system of the given planes or hyperplanes"""
+        rows = [dict(enumerate(p.normal_vector.coordinates)) for p in planes]
+        return cls(rows, [p.constant_term for p in planes],
+                   planes[0].normal_vector.dimension,
+                   planes[0].normal_vector.backend)
+
+    def copy(self):
+        system = SparseLinearSystem([], [], self.dimension, self.backend)
+        system.rows = [dict(row) for row in self.rows]
+        system.constant_terms = list(self.constant_terms)
+        system.pivot_indices = (None if self.pivot_indices is None
+                                else list(self.pivot_indices))
+        return system
+
+    def num_nonzeros(self):
+        return sum(len(row) for row in self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        return self.rows[i], self.constant_terms[i]
+
+    def __str__(self):
+        ret = 'Sparse Linear System: {} equations, {} variables, ' \
+              '{} non-zeros'.format(len(self), self.dimension,
+                                    self.num_nonzeros())
+        return ret
+
+    def rank(self, pivot_threshold=0.1):
+        """Returns the number of independent equations"""
+        pivot_indices = self.pivot_indices
+        if pivot_indices is None:
+            pivot_indices = self.compute_rref(pivot_threshold).pivot_indices
+        return sum(1 for index in pivot_indices if index >= 0)
+
+    def nullity(self, pivot_threshold=0.1):
+        """Returns the number of free variables"""
+        return self.dimension - self.rank(pivot_threshold)
+
+    def compute_rref(self, pivot_threshold=0.1):
+        """Returns a reduced copy of the system: every pivot row has a
+        coefficient 1 on its pivot variable, which appears in no other
+        row. pivot_indices[row] is the pivot variable of the row, or -1.
+        The rows are ordered as the pivots were chosen, followed by the
+        rows that became zero."""
+        system = self.copy()
+        rows = system.rows
+        constants = system.constant_terms
+        num_equations = len(rows)
+        threshold = self.backend.convert(str(pivot_threshold))
+        eps = self.backend.eps
+
+        rows_with_var = {}
+        for index, row in enumerate(rows):
+            for var in row:
+                rows_with_var.setdefault(var, set()).add(index)
+
+        def eliminate(pivot_row, pivot_var, target):
+            source = rows[pivot_row]
+            row = rows[target]
+            coefficient = -row[pivot_var] / source[pivot_var]
+            for var, value in source.items():
+                old_value = row.get(var, 0)
+                added = coefficient * value
+                new_value = old_value + added
+                # Drop the entries that cancel out, but keep small fill-in
+                if (var == pivot_var or
+                        abs(new_value) <= eps * (abs(old_value) +
+                                                 abs(added))):
+                    if var in row:
+                        del row[var]
+                        rows_with_var[var].discard(target)
+                else:
+                    if var not in row:
+                        rows_with_var.setdefault(var, set()).add(target)
+                    row[var] = new_value
+            constants[target] = (coefficient * constants[pivot_row] +
+                                 constants[target])
+
+        # Forward elimination in Markowitz order
+        active = set(range(num_equations))
+        heap = [(len(row), index) for index, row in enumerate(rows)]
+        heap.sort()
+        pivots = []
+        zero_rows = []
+        while active:
+            count, pivot_row = heappop(heap)
+            if pivot_row not in active:
+                continue
+            row = rows[pivot_row]
+            if count != len(row):
+                heappush(heap, (len(row), pivot_row))
+                continue
+            active.discard(pivot_row)
+            if not row:
+                zero_rows.append(pivot_row)
+                continue
+            largest = max(abs(value) for value in row.values()) * threshold
+            pivot_var = min(
+                (var for var, value in row.items()
+                 if abs(value) >= largest),
+                key=lambda var: (len(rows_with_var[var] & active), var))
+            pivots.append((pivot_row, pivot_var))
+            for target in sorted(rows_with_var[pivot_var] & active):
+                eliminate(pivot_row, pivot_var, target)
+                heappush(heap, (len(rows[target]), target))
+
+        # Back substitution: clear every pivot variable from the rows
+        # whose pivots were chosen earlier
+        one = self.backend.one
+        for pivot_row, pivot_var in reversed(pivots):
+            coefficient = one / rows[pivot_row][pivot_var]
+            rows[pivot_row] = {var: coefficient * value
+                               for var, value in rows[pivot_row].items()}
+            rows[pivot_row][pivot_var] = one
+            constants[pivot_row] = coefficient * constants[pivot_row]
+            for target in sorted(rows_with_var[pivot_var] - {pivot_row}):
+                eliminate(pivot_row, pivot_var, target)
+
+        order = [pivot_row for pivot_row, _ in pivots] + zero_rows
+        system.rows = [rows[i] for i in order]
+        system.constant_terms = [constants[i] for i in order]
+        system.pivot_indices = ([pivot_var for _, pivot_var in pivots] +
+                                [-1] * len(zero_rows))
+        return system
+
+    def compute_solution(self, pivot_threshold=0.1):
+        """Returns the Parametrization of the solutions, or
+        LinearSystem.NO_SOLUTIONS_MSG"""
+        rref = self.compute_rref(pivot_threshold)
+        pivot_indices = rref.pivot_indices
+
+        basepoint_coords = [0] * self.dimension
+        for row, pivot_var in enumerate(pivot_indices):
+            if pivot_var < 0:
+                if not is_near_zero(rref.constant_terms[row]):
+                    return LinearSystem.NO_SOLUTIONS_MSG
+            else:
+                basepoint_coords[pivot_var] = rref.constant_terms[row]
+
+        free_variable_indices = sorted(set(range(self.dimension)) -
+                                       set(pivot_indices))
+        direction_vectors = []
+        for free_var in free_variable_indices:
+            vector_coords = [0] * self.dimension
+            vector_coords[free_var] = 1
+            for row, pivot_var in enumerate(pivot_indices):
+                if pivot_var < 0:
+                    break
+                coefficient = rref.rows[row].get(free_var)
+                if coefficient is not None:
+                    vector_coords[pivot_var] = -coefficient
+            direction_vectors.append(Vector(vector_coords, self.backend))
+
+        return Parametrization(Vector(basepoint_coords, self.backend),
+                               direction_vectors)
@@ -0,0 +1,242 @@
+"""Hash index of lines, planes and hyperplanes for finding coincident
+and parallel equations without comparing every pair"""
+from itertools import product
+from math import sqrt
+from operator import mul
+
+
+def equation_of(item):
+    """Returns (coefficients, constant term) of a Line, Plane or
+    Hyperplane, or of an augmented row [a_1, ..., a_n, k]"""
+    try:
+        return item.normal_vector.coordinates, item.constant_term
+    except AttributeError:
+        return item[:-1], item[-1]
+
+
+def canonical_form(coefficients, constant_term, tolerance=1e-10):
+    """Returns (direction, offset) such that the equation is
+    direction . x = offset with a unit direction whose first non-zero
+    coordinate is positive, or None when the coefficients are all zero.
+    Equal forms describe the same hyperplane."""
+    coefficients = [float(x) for x in coefficients]
+    norm = sqrt(sum(x * x for x in coefficients))
+    if norm <= tolerance:
+        return None
+    sign = 1.0
+    for x in coefficients:
+        if abs(x) > tolerance * norm:
+            sign = 1.0 if x > 0 else -1.0
+            break
+    scale = sign / norm
+    return (tuple(x * scale for x in coefficients),
+            float(constant_term) * scale)
+
+
+def exact_canonical_form(coefficients, constant_term):
+    """Returns (direction, offset) such that the equation is
+    direction . x = offset with a first non-zero coordinate equal to
+    one, computed exactly in the coefficients' own numbers, or None when
+    the coefficients are all zero"""
+    for x in coefficients:
+        if x:
+            return (tuple(y / x for y in coefficients), constant_term / x)
+    return None
+
+
+class HyperplaneIndex(object):
+    """Buckets equations by their canonical form, quantized to cells of
+    size resolution centred on the multiples of resolution. The cells
+    of a coordinate are widened to four times the tolerance on it when
+    that is larger.
+
+    Two equations are coincident when their canonical forms differ by at
+    most tolerance in every coordinate, and parallel when their
+    directions do. Only the first HASHED_COORDINATES coordinates of the
+    direction (and the offset) pick the bucket, and a query only probes
+    the neighbouring cell for those within tolerance of a cell boundary;
+    the candidates are then compared on every coordinate. Adding or
+    looking up an equation thus takes about constant time and grouping
+    N equations about O(N) instead of O(N^2) pairwise comparisons,
+    whatever the dimension. A weighted sum of all the coordinates is
+    hashed as well, so that sparse equations whose first coordinates
+    are zero still spread over the buckets.
+
+    With exact=True (for fraction coefficients) the canonical forms are
+    computed exactly and equations are only coincident or parallel when
+    their forms are equal; tolerance and resolution are not used.
+
+    Equations with all-zero coefficients are never parallel to others;
+    they are coincident with each other when their constant terms are
+    both zero (0 = 0) or both non-zero (0 = k, no solutions)."""
+    HASHED_COORDINATES = 8
+
+    def __init__(self, items=(), tolerance=1e-10, resolution=1e-6,
+                 exact=False):
+        self.tolerance = tolerance
+        self.resolution = resolution
+        self.exact = exact
+        self.items = []
+        self.forms = []
+        # item index -> index of the first item of its group
+        self.coincident_with = []
+        self.parallel_to = []
+        # True for 0 = k with k non-zero, False for 0 = 0, None otherwise
+        self._contradictory = []
+        self._coincident_buckets = {}
+        self._parallel_buckets = {}
+        # dimension -> weights of the hashed weighted sum
+        self._weights = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _hashed_values(self, form, with_offset):
+        """Returns the values that pick the bucket of a form and how
+        much each of them may differ between close forms"""
+        if self.exact:
+            return (form if with_offset else form[0]), None
+        direction = form[0]
+        weights = self._weights.get(len(direction))
+        if weights is None:
+            # Fixed weights in [0, 1) that differ between coordinates
+            weights = [(0.6180339887498949 * (i + 1)) % 1
+                       for i in range(len(direction))]
+            self._weights[len(direction)] = weights
+        values = direction[:self.HASHED_COORDINATES] + (
+            sum(map(mul, weights, direction)),)
+        tolerances = [self.tolerance] * (len(values) - 1) + [
+            self.tolerance * sum(weights)]
+        if with_offset:
+            values += (form[1],)
+            tolerances.append(self.tolerance)
+        return values, tolerances
+
+    def _cells(self, values, tolerances):
+        """Returns the cell of the values followed by the neighbouring
+        cells that may hold values within the tolerances"""
+        if self.exact:
+            return iter([values])
+        choices = []
+        for x, tolerance in zip(values, tolerances):
+            # Cells at least four tolerances wide, so that close values
+            # are at most in the neighbouring cell
+            size = max(self.resolution, 4 * tolerance)
+            margin = 0.5 - tolerance / size
+            scaled = x / size
+            cell = round(scaled)
+            if scaled - cell > margin:
+                choices.append((cell, cell + 1))
+            elif cell - scaled > margin:
+                choices.append((cell, cell - 1))
+            else:
+                choices.append((cell,))
+        return product(*choices)
+
+    def _close(self, values1, values2):
+        if self.exact:
+            return values1 == values2
+        return all(abs(x - y) <= self.tolerance
+                   for x, y in zip(values1, values2))
+
+    def _find(self, buckets, form, with_offset):
+        """Returns the indices of the items whose form (or direction
+        without the offset) is close to the given one, in insertion
+        order"""
+        found = []
+        for cell in self._cells(*self._hashed_values(form, with_offset)):
+            for index in buckets.get(cell, ()):
+                other = self.forms[index]
+                if self._close(form[0], other[0]) and (
+                        not with_offset or self._close((form[1],),
+                                                       (other[1],))):
+                    found.append(index)
+        return sorted(found)
+
+    def _form(self, item):
+        coefficients, constant_term = equation_of(item)
+        if self.exact:
+            form = exact_canonical_form(coefficients, constant_term)
+            if form is None:
+                return None, constant_term != 0
+            return form, None
+        form = canonical_form(coefficients, constant_term, self.tolerance)
+        if form is None:
+            return None, abs(float(constant_term)) > self.tolerance
+        return form, None
+
+    def find_coincident(self, item):
+        """Returns the indices of the indexed equations that describe
+        the same hyperplane as item"""
+        form, contradictory = self._form(item)
+        if form is None:
+            return [index for index, other in enumerate(self.forms)
+                    if other is None and
+                    self._contradictory[index] == contradictory]
+        return self._find(self._coincident_buckets, form, True)
+
+    def find_parallel(self, item):
+        """Returns the indices of the indexed equations parallel to item
+        (including the coincident ones)"""
+        form, _ = self._form(item)
+        if form is None:
+            return []
+        return self._find(self._parallel_buckets, form, False)
+
+    def add(self, item):
+        """Indexes item and returns its index"""
+        index = len(self.items)
+        coincident = self.find_coincident(item)
+        parallel = self.find_parallel(item)
+        form, contradictory = self._form(item)
+        self.items.append(item)
+        self.forms.append(form)
+        self._contradictory.append(contradictory)
+        self.coincident_with.append(
+            self.coincident_with[coincident[0]] if coincident else index)
+        self.parallel_to.append(
+            self.parallel_to[parallel[0]] if parallel else index)
+        if form is not None:
+            self._coincident_buckets.setdefault(
+                next(self._cells(*self._hashed_values(form, True))),
+                []).append(index)
+            self._parallel_buckets.setdefault(
+                next(self._cells(*self._hashed_values(form, False))),
+                []).append(index)
+        return index
+
+    def _groups(self, representatives):
+        groups = {}
+        for index, representative in enumerate(representatives):
+            groups.setdefault(representative, []).append(index)
+        return [group for _, group in sorted(groups.items())]
+
+    def duplicate_groups(self):
+        """Returns the groups (lists of indices) of coincident equations
+        that hold more than one equation"""
+        return [group for group in self._groups(self.coincident_with)
+                if len(group) > 1]
+
+    def parallel_families(self):
+        """Returns the groups (lists of indices) of parallel equations,
+        including the single ones"""
+        return [group for group in self._groups(self.parallel_to)
+                if self.forms[group[0]] is not None]
+
+    def unique_indices(self):
+        """Returns the index of the first equation of every group of
+        coincident equations"""
+        return [index for index, representative in
+                enumerate(self.coincident_with) if index == representative]
+
+    def unique(self):
+        """Returns the equations without the coincident repeats"""
+        return [self.items[index] for index in self.unique_indices()]
+
+
+def deduplicate(items, tolerance=1e-10, exact=False):
+    """Returns the items without the equations coincident with an
+    earlier one"""
+    return HyperplaneIndex(items, tolerance, exact=exact).unique()
@@ -0,0 +1,86 @@
+import random
+import unittest
+from fractions import Fraction
+
+from vector import Vector
+from hyperplane import Hyperplane
+from matrix import AugmentedMatrix
+from linsys import LinearSystem
+from spatial_index import HyperplaneIndex, canonical_form
+
+
+def sparse_rows(count, dimension, nonzeros, rnd):
+    rows = []
+    for _ in range(count):
+        row = [0.0] * (dimension + 1)
+        for var in rnd.sample(range(dimension), nonzeros):
+            row[var] = float(rnd.choice([-3, -2, -1, 1, 2, 3]))
+        row[-1] = float(rnd.randint(-2, 2))
+        rows.append(row)
+    return rows
+
+
+class CountingIndex(HyperplaneIndex):
+    """Counts the cells probed"""
+    probes = 0
+
+    def _cells(self, values, tolerances):
+        cells = list(super(CountingIndex, self)._cells(values, tolerances))
+        self.probes += len(cells)
+        return iter(cells)
+
+
+class HyperplaneIndexTest(unittest.TestCase):
+
+    def test_sparse_rows_in_many_dimensions(self):
+        rnd = random.Random(0)
+        rows = sparse_rows(200, 40, 3, rnd)
+        rows += [[-2.5 * x for x in row] for row in rows[:40]]
+        index = HyperplaneIndex(rows)
+
+        forms = [canonical_form(row[:-1], row[-1]) for row in rows]
+        for i in range(len(rows)):
+            for j in range(i):
+                same = all(abs(x - y) <= 1e-10 for x, y in
+                           zip(forms[i][0] + (forms[i][1],),
+                               forms[j][0] + (forms[j][1],)))
+                self.assertEqual(same, index.coincident_with[i] ==
+                                 index.coincident_with[j])
+        for i in range(200, 240):
+            self.assertEqual(index.coincident_with[i], i - 200)
+
+    def test_probes_do_not_grow_with_zero_coordinates(self):
+        rnd = random.Random(1)
+        for nonzeros in (40, 20, 3):
+            index = CountingIndex(sparse_rows(100, 40, nonzeros, rnd))
+            # Two lookups and two bucket keys, each of one cell and at
+            # most a few neighbours
+            self.assertLessEqual(index.probes, 100 * 8)
+
+    def test_tolerance_wider_than_resolution(self):
+        index = HyperplaneIndex([[1, 2, 3], [1, 2, 3.00005],
+                                 [1, 2, 3.01]], tolerance=1e-3)
+        self.assertEqual(index.coincident_with, [0, 0, 2])
+
+    def test_deduplicated_sparse_system(self):
+        rows = [[float(var == i) for var in range(30)] + [1.0]
+                for i in range(4)]
+        rows.append([2 * x for x in rows[0]])
+        system = LinearSystem.from_matrix(AugmentedMatrix(rows, 30, 'float'))
+        self.assertEqual(len(system.deduplicated()), 4)
+
+    def test_exact_systems_only_drop_equal_equations(self):
+        planes = [
+            Hyperplane(normal_vector=Vector([1, Fraction(1, 3)], 'fraction'),
+                       constant_term=1),
+            Hyperplane(normal_vector=Vector(
+                [1, Fraction(1, 3) + Fraction(1, 10**12)], 'fraction'),
+                       constant_term=1),
+            Hyperplane(normal_vector=Vector([3, 1], 'fraction'),
+                       constant_term=3),
+        ]
+        self.assertEqual(len(LinearSystem(planes).deduplicated()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,25 +1,37 @@
 """Thi module is from Udacity course on Linear Algebra"""
-from math import acos, degrees, pi
-from decimal import Decimal, getcontext
+from math import acos, degrees
+from decimal import getcontext
+
+from backend import get_backend
+
 getcontext().prec = 30
 
 
 class Vector(object):
     """This class contains the properties
-    and modules to create N dimentional vectors"""
+    and modules to create N dimentional vectors.
+    The coordinates are stored with the given numeric backend
+    (name or instance), or the default backend when omitted.
+    Vectors are immutable, so the magnitude, the normalized form and
+    the zero check are computed once and cached"""
+    __slots__ = ('backend', 'coordinates', 'dimension',
+                 '_magnitude', '_normalized', '_is_zero')
+
     CANNOT_NORMALIZE_ZERO_VECTOR_MSG = 'Cannot normalize the zero vector'
     NO_UNIQUE_PARALLEL_COMPONENT_MSG = 'No unique parallel component'
     NO_UNIQUE_ORTHOGONAL_COMPONENT_MSG = 'No unique orthogonal component'
     ONLY_DEFINED_IN_TWO_THREE_DIMS_MSG = 'Defined only in two or \
     three dimentions only'
     VECTOR_DIM_MISMATCH_MSG = 'Vectors'' dimentions do not match'
+    IMMUTABLE_VECTOR_MSG = 'Vectors are immutable'
 
-    def __init__(self, coordinates):
+    def __init__(self, coordinates, backend=None):
+        backend = get_backend(backend)
         try:
             if not coordinates:
                 raise ValueError
-            self.coordinates = tuple([Decimal(x) for x in coordinates])
-            self.dimension = len(coordinates)
+            convert = backend.convert
+            coordinates = tuple([convert(x) for x in coordinates])
 
         except ValueError:
             raise ValueError('The coordinates must be nonempty')
@@ -27,56 +39,151 @@ class Vector(object):
         except TypeError:
             raise TypeError('The coordinates must be an iterable')
 
+        set_attribute = object.__setattr__
+        set_attribute(self, 'backend', backend)
+        set_attribute(self, 'coordinates', coordinates)
+        set_attribute(self, 'dimension', len(coordinates))
+        set_attribute(self, '_magnitude', None)
+        set_attribute(self, '_normalized', None)
+        set_attribute(self, '_is_zero', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(self.IMMUTABLE_VECTOR_MSG)
+
+    def __delattr__(self, name):
+        raise AttributeError(self.IMMUTABLE_VECTOR_MSG)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (Vector, (self.coordinates, self.backend))
+
     def __str__(self):
         return 'Vector: {}'.format(self.coordinates)
 
     def __eq__(self, v):
         return self.coordinates == v.coordinates
 
+    def __hash__(self):
+        return hash(self.coordinates)
+
+    def to_backend(self, backend):
+        """Returns this vector with its coordinates converted
+        to the given backend"""
+        return Vector(self.coordinates, backend)
+
     def is_zero(self, tolerance=1e-10):
         """Checks if this vector is zero"""
-        return self.magnitude() < tolerance
+        if tolerance != 1e-10:
+            return self.magnitude() < tolerance
+        is_zero = self._is_zero
+        if is_zero is None:
+            is_zero = self.magnitude() < tolerance
+            object.__setattr__(self, '_is_zero', is_zero)
+        return is_zero
 
     def is_parallel_to(self, input_vector, tolerance=1e-10):
-        """Checks if this vector is parallel to the input vector"""
-        return (self.is_zero() or
-                input_vector.is_zero() or
-                self.angle_with(input_vector) < tolerance or
-                (self.angle_with(input_vector) < pi+tolerance and
-                 self.angle_with(input_vector) > pi-tolerance))
+        """Checks if this vector is parallel to the input vector, i.e.
+        the sine of their angle is below the tolerance. The zero vector
+        is parallel to every vector"""
+        if self.is_zero() or input_vector.is_zero():
+            return True
+        tolerance = self._relative_tolerance(tolerance)
+        if not tolerance:
+            # Exact test: the 2x2 minors with a non-zero coordinate of
+            # this vector all vanish
+            u = self.coordinates
+            v = input_vector.coordinates
+            k = next(i for i, x in enumerate(u) if x)
+            return all(u[k]*y == v[k]*x for x, y in zip(u, v))
+        return (self.gram_determinant_with(input_vector) <=
+                (tolerance * self.magnitude() *
+                 input_vector.magnitude())**2)
 
     def is_orthogonal_to(self, input_vector, tolerance=1e-10):
-        """Checks if this vector is orthogonal"""
-        return abs(self.dot(input_vector)) < tolerance
+        """Checks if this vector is orthogonal to the input vector, i.e.
+        the cosine of their angle is below the tolerance. The zero
+        vector is orthogonal to every vector"""
+        if self.is_zero() or input_vector.is_zero():
+            return True
+        tolerance = self._relative_tolerance(tolerance)
+        return (abs(self.dot(input_vector)) <=
+                tolerance * self.magnitude() * input_vector.magnitude())
+
+    def _relative_tolerance(self, tolerance):
+        """The tolerance in the backend's numbers; the default one is
+        the backend's eps, which is zero (exact tests) for fractions"""
+        if tolerance == 1e-10:
+            return self.backend.eps
+        return self.backend.convert(tolerance)
+
+    def gram_determinant_with(self, input_vector):
+        """Returns |u|^2 |v|^2 - (u.v)^2, the squared area of the
+        parallelogram of the two vectors. Up to three dimensions it is
+        the sum of the squared 2x2 minors (|u x v|^2), otherwise
+        |u|^2 |w|^2 with w the component of v orthogonal to u, which
+        does not cancel out for nearly parallel vectors"""
+        u = self.coordinates
+        v = input_vector.coordinates
+        if len(u) != len(v):
+            raise Exception(self.VECTOR_DIM_MISMATCH_MSG)
+        if len(u) == 1:
+            return self.backend.zero
+        if len(u) == 2:
+            return (u[0]*v[1] - u[1]*v[0])**2
+        if len(u) == 3:
+            return ((u[1]*v[2] - u[2]*v[1])**2 +
+                    (u[2]*v[0] - u[0]*v[2])**2 +
+                    (u[0]*v[1] - u[1]*v[0])**2)
+        squared_magnitude = self.dot(self)
+        if not squared_magnitude:
+            return self.backend.zero
+        weight = self.dot(input_vector) / squared_magnitude
+        residual = sum([(y - weight*x)**2 for x, y in zip(u, v)])
+        return squared_magnitude * residual
 
     def plus(self, input_vector):
         """Sum of this vector with the input"""
         new_coordinates = [x+y for x, y in
                            zip(self.coordinates, input_vector.coordinates)]
-        return Vector(new_coordinates)
+        return Vector(new_coordinates, self.backend)
 
     def minus(self, input_vector):
         """Subtract the input from the current vector)"""
         new_coordinates = [x-y for x, y in
                            zip(self.coordinates, input_vector.coordinates)]
-        return Vector(new_coordinates)
+        return Vector(new_coordinates, self.backend)
 
     def magnitude(self):
         """Get the magnitude of the vector"""
-        return sum([x**2 for x in self.coordinates])**Decimal('0.5')
+        magnitude = self._magnitude
+        if magnitude is None:
+            magnitude = self.backend.sqrt(
+                sum([x**2 for x in self.coordinates]))
+            object.__setattr__(self, '_magnitude', magnitude)
+        return magnitude
 
     def normalized(self):
         """Get the normalized form of the vector"""
-        try:
-            magnitude = self.magnitude()
-            return self.times_scalar(Decimal('1.0')/magnitude)
-        except ZeroDivisionError:
-            raise Exception(self.CANNOT_NORMALIZE_ZERO_VECTOR_MSG)
+        normalized = self._normalized
+        if normalized is None:
+            try:
+                magnitude = self.magnitude()
+                normalized = self.times_scalar(self.backend.one/magnitude)
+            except ZeroDivisionError:
+                raise Exception(self.CANNOT_NORMALIZE_ZERO_VECTOR_MSG)
+            object.__setattr__(self, '_normalized', normalized)
+        return normalized
 
     def times_scalar(self, multiplier):
         """Get scalar multiplication value of the vector in list format"""
-        new_coordinates = [Decimal(multiplier)*x for x in self.coordinates]
-        return Vector(new_coordinates)
+        multiplier = self.backend.convert(multiplier)
+        new_coordinates = [multiplier*x for x in self.coordinates]
+        return Vector(new_coordinates, self.backend)
 
     def dot(self, input_vector):
         """Get dot product value of this vector with the input vector"""
@@ -88,7 +195,10 @@ class Vector(object):
         and the input vector in either radian(default) or degrees"""
         vector_one = self.normalized()
         vector_two = input_vector.normalized()
-        angle_in_radians = acos(vector_one.dot(vector_two))
+        # Rounding can push the cosine of (anti)parallel vectors
+        # slightly outside [-1, 1]
+        cosine = max(min(vector_one.dot(vector_two), 1), -1)
+        angle_in_radians = acos(cosine)
         if in_degrees is False:
             return_value = angle_in_radians
         else:
@@ -130,15 +240,15 @@ class Vector(object):
             raise Exception(self.VECTOR_DIM_MISMATCH_MSG)
         else:
             if len(vector1) == 2:
-                vector1 = vector1 + (Decimal('0'),)
-                vector2 = vector2 + (Decimal('0'),)
+                vector1 = vector1 + (self.backend.zero,)
+                vector2 = vector2 + (self.backend.zero,)
             item0 = (vector1[1]*vector2[2] -
                      vector2[1]*vector1[2])
             item1 = -(vector1[0]*vector2[2] -
                       vector2[0]*vector1[2])
             item2 = (vector1[0]*vector2[1] -
                      vector2[0]*vector1[1])
-            return Vector([item0, item1, item2])
+            return Vector([item0, item1, item2], self.backend)
 
     def area_of_parallelogram_with(self, input_vector):
         """Returns the area of the parallelogram created by
@@ -149,7 +259,8 @@ class Vector(object):
     def area_of_triangle_with(self, input_vector):
         """Returns the area of the parallelogram created by
         connecting itself with the input vector"""
-        return Decimal('0.5')*self.area_of_parallelogram_with(input_vector)
+        return (self.backend.convert('0.5') *
+                self.area_of_parallelogram_with(input_vector))
 
     def __getitem__(self, i):
         return self.coordinates[i]
@@ -0,0 +1,240 @@
+"""Batched N x d vectors stored in one contiguous float64 buffer"""
+from array import array
+from math import acos, degrees, sqrt
+from operator import mul
+
+from vector import Vector
+
+
+class VectorArray(object):
+    """N vectors of dimension d stored row after row in an array('d').
+    The methods mirror Vector but work on all rows at once: the other
+    operand is a VectorArray of the same length (pairwise) or a single
+    Vector (applied to every row). Scalar results are array('d')."""
+    LENGTH_MISMATCH_MSG = 'Vector arrays must have the same length'
+    BUFFER_SIZE_MISMATCH_MSG = ('The buffer size must be a multiple '
+                                'of the dimension')
+
+    def __init__(self, data, dimension):
+        if dimension <= 0:
+            raise ValueError('The dimension must be positive')
+        self.data = data if isinstance(data, array) else array('d', data)
+        self.dimension = dimension
+        if len(self.data) % dimension:
+            raise ValueError(self.BUFFER_SIZE_MISMATCH_MSG)
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        """Packs a non-empty sequence of Vectors"""
+        dimension = vectors[0].dimension
+        data = array('d')
+        for v in vectors:
+            if v.dimension != dimension:
+                raise Exception(Vector.VECTOR_DIM_MISMATCH_MSG)
+            data.extend(float(x) for x in v.coordinates)
+        return cls(data, dimension)
+
+    @classmethod
+    def from_lists(cls, rows):
+        """Packs a non-empty sequence of coordinate sequences"""
+        dimension = len(rows[0])
+        data = array('d')
+        for row in rows:
+            if len(row) != dimension:
+                raise Exception(Vector.VECTOR_DIM_MISMATCH_MSG)
+            data.extend(row)
+        return cls(data, dimension)
+
+    def to_vectors(self, backend='float'):
+        """Unpacks the rows into Vectors of the given backend"""
+        return [Vector(row, backend) for row in self.rows()]
+
+    def rows(self):
+        """Yields every row as a slice of the buffer"""
+        data, d = self.data, self.dimension
+        for start in range(0, len(data), d):
+            yield data[start:start + d]
+
+    def __len__(self):
+        return len(self.data) // self.dimension
+
+    def __getitem__(self, i):
+        d = self.dimension
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('VectorArray index out of range')
+        return Vector(self.data[i * d:(i + 1) * d], 'float')
+
+    def __iter__(self):
+        return iter(self.to_vectors())
+
+    def __str__(self):
+        return 'VectorArray: {} x {}'.format(len(self), self.dimension)
+
+    def _broadcast(self, other):
+        """Returns the other operand as a VectorArray of the same
+        shape, repeating a single Vector once per row"""
+        if other.dimension != self.dimension:
+            raise Exception(Vector.VECTOR_DIM_MISMATCH_MSG)
+        if isinstance(other, Vector):
+            data = array('d', [float(x) for x in other.coordinates])
+            return VectorArray(data * len(self), self.dimension)
+        if len(other) != len(self):
+            raise Exception(self.LENGTH_MISMATCH_MSG)
+        return other
+
+    def _other_data(self, other):
+        return self._broadcast(other).data
+
+    def plus(self, other):
+        data = array('d', map(float.__add__, self.data,
+                              self._other_data(other)))
+        return VectorArray(data, self.dimension)
+
+    def minus(self, other):
+        data = array('d', map(float.__sub__, self.data,
+                              self._other_data(other)))
+        return VectorArray(data, self.dimension)
+
+    def times_scalars(self, multipliers):
+        """Multiplies row i by multipliers[i]"""
+        d = self.dimension
+        data = self.data
+        out = array('d', data)
+        for i, m in enumerate(multipliers):
+            start = i * d
+            out[start:start + d] = array('d', [m * x for x in
+                                               data[start:start + d]])
+        return VectorArray(out, d)
+
+    def dot(self, other):
+        """Row-wise dot products"""
+        a, b, d = self.data, self._other_data(other), self.dimension
+        if d == 2:
+            return array('d', [a[i] * b[i] + a[i + 1] * b[i + 1]
+                               for i in range(0, len(a), 2)])
+        if d == 3:
+            return array('d', [a[i] * b[i] + a[i + 1] * b[i + 1] +
+                               a[i + 2] * b[i + 2]
+                               for i in range(0, len(a), 3)])
+        return array('d', [sum(map(mul, a[i:i + d], b[i:i + d]))
+                           for i in range(0, len(a), d)])
+
+    def magnitude(self):
+        """Row-wise magnitudes"""
+        return array('d', [sqrt(x) for x in self.dot(self)])
+
+    def is_zero(self, tolerance=1e-10):
+        return [m < tolerance for m in self.magnitude()]
+
+    def normalized(self):
+        """Row-wise normalization; fails if any row is the zero vector"""
+        magnitudes = self.magnitude()
+        try:
+            return self.times_scalars([1.0 / m for m in magnitudes])
+        except ZeroDivisionError:
+            raise Exception(Vector.CANNOT_NORMALIZE_ZERO_VECTOR_MSG)
+
+    def angle_with(self, other, in_degrees=False):
+        """Row-wise angles in radians (default) or degrees"""
+        cosines = self.normalized().dot(self._broadcast(other).normalized())
+        angles = [acos(max(min(c, 1.0), -1.0)) for c in cosines]
+        if in_degrees:
+            angles = [degrees(a) for a in angles]
+        return array('d', angles)
+
+    def gram_determinant_with(self, other):
+        """Row-wise |u|^2 |v|^2 - (u.v)^2, see Vector.gram_determinant_with"""
+        a, b, d = self.data, self._other_data(other), self.dimension
+        if d == 1:
+            return array('d', [0.0]) * len(self)
+        if d == 2:
+            return array('d', [(a[i] * b[i + 1] - a[i + 1] * b[i]) ** 2
+                               for i in range(0, len(a), 2)])
+        if d == 3:
+            out = array('d', [0.0]) * len(self)
+            for i in range(0, len(a), 3):
+                a0, a1, a2 = a[i], a[i + 1], a[i + 2]
+                b0, b1, b2 = b[i], b[i + 1], b[i + 2]
+                out[i // 3] = ((a1 * b2 - a2 * b1) ** 2 +
+                               (a2 * b0 - a0 * b2) ** 2 +
+                               (a0 * b1 - a1 * b0) ** 2)
+            return out
+        out = array('d', [0.0]) * len(self)
+        for i in range(len(self)):
+            u = a[i * d:(i + 1) * d]
+            v = b[i * d:(i + 1) * d]
+            squared_magnitude = sum(map(mul, u, u))
+            if squared_magnitude:
+                weight = sum(map(mul, u, v)) / squared_magnitude
+                out[i] = squared_magnitude * sum(
+                    [(y - weight * x) ** 2 for x, y in zip(u, v)])
+        return out
+
+    def is_parallel_to(self, other, tolerance=1e-10):
+        """Row-wise Vector.is_parallel_to, as a list of booleans"""
+        other = self._broadcast(other)
+        magnitudes = self.magnitude()
+        other_magnitudes = other.magnitude()
+        return [m < tolerance or n < tolerance or
+                g <= (tolerance * m * n) ** 2
+                for m, n, g in zip(magnitudes, other_magnitudes,
+                                   self.gram_determinant_with(other))]
+
+    def is_orthogonal_to(self, other, tolerance=1e-10):
+        """Row-wise Vector.is_orthogonal_to, as a list of booleans"""
+        other = self._broadcast(other)
+        return [m < tolerance or n < tolerance or
+                abs(c) <= tolerance * m * n
+                for m, n, c in zip(self.magnitude(), other.magnitude(),
+                                   self.dot(other))]
+
+    def component_parallel_to(self, basis):
+        """Row-wise projections onto the basis vectors"""
+        try:
+            normalized = self._broadcast(basis).normalized()
+        except Exception as exp:
+            if str(exp) == Vector.CANNOT_NORMALIZE_ZERO_VECTOR_MSG:
+                raise Exception(Vector.NO_UNIQUE_PARALLEL_COMPONENT_MSG)
+            else:
+                raise exp
+        return normalized.times_scalars(self.dot(normalized))
+
+    def component_orthogonal_to(self, basis):
+        """Row-wise components orthogonal to the basis vectors"""
+        try:
+            projection = self.component_parallel_to(basis)
+        except Exception as exp:
+            if str(exp) == Vector.NO_UNIQUE_PARALLEL_COMPONENT_MSG:
+                raise Exception(Vector.NO_UNIQUE_ORTHOGONAL_COMPONENT_MSG)
+            else:
+                raise exp
+        return self.minus(projection)
+
+    def cross(self, other):
+        """Row-wise cross products, defined in two or three dimensions"""
+        d = self.dimension
+        if d not in (2, 3):
+            raise Exception(Vector.ONLY_DEFINED_IN_TWO_THREE_DIMS_MSG)
+        a, b = self.data, self._other_data(other)
+        out = array('d', [0.0]) * (3 * len(self))
+        if d == 2:
+            for i in range(len(self)):
+                j = 2 * i
+                out[3 * i + 2] = a[j] * b[j + 1] - b[j] * a[j + 1]
+        else:
+            for i in range(0, len(a), 3):
+                a0, a1, a2 = a[i], a[i + 1], a[i + 2]
+                b0, b1, b2 = b[i], b[i + 1], b[i + 2]
+                out[i] = a1 * b2 - b1 * a2
+                out[i + 1] = -(a0 * b2 - b0 * a2)
+                out[i + 2] = a0 * b1 - b0 * a1
+        return VectorArray(out, 3)
+
+    def area_of_parallelogram_with(self, other):
+        return self.cross(other).magnitude()
+
+    def area_of_triangle_with(self, other):
+        return array('d', [0.5 * x for x in
+                           self.area_of_parallelogram_with(other)])